@@ -0,0 +1,46 @@
+"""
+Gunicorn settings, read from the working directory by a plain
+`gunicorn inventory_project.wsgi`.
+
+The app is loaded once in the master and warmed up there (see
+inventory/warmup.py), then every worker is forked from it with URLs
+resolved and templates compiled. Nothing is cached in the master: each
+worker's cache is its own, and one filled before the fork would be a copy
+that a change clears in one worker only, so each worker primes its own
+caches right after the fork. Database connections are never shared across
+the fork either: the master closes its own before forking and each worker
+opens fresh ones.
+"""
+import os
+import time
+
+STARTED = time.perf_counter()
+
+preload_app = True
+# Render sets WEB_CONCURRENCY from the instance size
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+
+
+def when_ready(server):
+    from django.db import connections
+
+    from inventory.warmup import format_timings, warm_up
+
+    for line in format_timings(warm_up(caches=False, connect=False)):
+        server.log.info(line)
+    connections.close_all()
+    server.log.info(f"Ready to fork workers {time.perf_counter() - STARTED:.2f}s after start")
+
+
+def pre_fork(server, worker):
+    from django.db import connections
+
+    # A connection used from two processes corrupts both sides' state
+    connections.close_all()
+
+
+def post_fork(server, worker):
+    from inventory.warmup import format_timings, warm_up
+
+    for line in format_timings(warm_up(preload=False)):
+        worker.log.info(f"Worker {worker.pid}: {line}")
@@ -1,12 +1,70 @@
 from django.contrib import admin
-from .models import Status, Pump, Valve, Filter, MixTank, CommandCenter, Misc, RepairLog
+from django.db.models import Q
+
+from .models import Status, Pump, Valve, Filter, MixTank, CommandCenter, Misc, RepairLog, Location
+from .pagination import EstimatedCountPaginator
+from .search import prefix_range
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """
+    Changelist defaults for tables that grow large: no second COUNT(*) for the
+    "x of y" total, estimated counts for unfiltered lists, and searches that
+    are prefix ranges on indexed columns rather than LIKE '%term%' scans.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Searched as "starts with"; every field listed here must be indexed
+    prefix_search_fields = []
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term or not self.prefix_search_fields:
+            return super().get_search_results(request, queryset, search_term)
+
+        # Try the common spellings, as the typeahead does; each is still an index range
+        condition = Q()
+        for field in self.prefix_search_fields:
+            for prefix in {search_term, search_term.upper(), search_term.capitalize(), search_term.title()}:
+                condition |= prefix_range(field, prefix)
+        return queryset.filter(condition), False
+
+
+class ItemAdmin(ScalableAdmin):
+    list_display = ['item_id', 'status', 'location', 'vendor', 'last_updated']
+    list_select_related = ['status']
+    list_filter = ['status']
+    search_fields = prefix_search_fields = ['item_id', 'location']
+    search_help_text = "Item ID or location, starting with the text entered."
+    date_hierarchy = 'last_updated'
+    raw_id_fields = ['location_node']
+
+
+class RepairLogAdmin(ScalableAdmin):
+    list_display = ['item', 'repair_company', 'start_date', 'expected_return_date', 'end_date', 'cost', 'is_active']
+    # __str__ shows the item ID
+    list_select_related = ['item']
+    list_filter = ['is_active']
+    search_fields = prefix_search_fields = ['item__item_id']
+    search_help_text = "Item ID, starting with the text entered."
+    date_hierarchy = 'start_date'
+    raw_id_fields = ['item']
+
+
+class LocationAdmin(ScalableAdmin):
+    list_display = ['full_name', 'kind']
+    list_filter = ['kind']
+    search_fields = ['name']
+    raw_id_fields = ['parent']
+
 
 # Tell the Django admin to create an interface for each of our models
-admin.site.register(RepairLog)
+admin.site.register(RepairLog, RepairLogAdmin)
 admin.site.register(Status)
-admin.site.register(Pump)
-admin.site.register(Valve)
-admin.site.register(Filter)
-admin.site.register(MixTank)
-admin.site.register(CommandCenter)
-admin.site.register(Misc)
\ No newline at end of file
+admin.site.register(Pump, ItemAdmin)
+admin.site.register(Valve, ItemAdmin)
+admin.site.register(Filter, ItemAdmin)
+admin.site.register(MixTank, ItemAdmin)
+admin.site.register(CommandCenter, ItemAdmin)
+admin.site.register(Misc, ItemAdmin)
+admin.site.register(Location, LocationAdmin)
@@ -0,0 +1,154 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum, Window
+from django.db.models.functions import CumeDist, TruncMonth
+from django.utils import timezone
+
+from .models import RepairLog
+from .routers import current_site, site_for_database
+
+# Bumped whenever one of the site's repair logs changes, so cached reports are never stale
+VERSION_CACHE_KEY = 'repair-analytics-version:{site}'
+REPORT_TIMEOUT = 60 * 60 * 24
+TURNAROUND_PERCENTILES = [50, 90, 95]
+
+
+def invalidate_repair_analytics(sender=None, using=None, **kwargs):
+    """
+    Connected to RepairLog post_save / post_delete. Changing the version makes
+    every cached report of the repair's site unreachable; they expire on their own.
+    """
+    key = VERSION_CACHE_KEY.format(site=site_for_database(using) or current_site())
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def month_end(day):
+    """
+    The last day of `day`'s month.
+    """
+    return (day.replace(day=1) + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+
+
+def analytics_period(first_month, last_month):
+    """
+    The whole months from `first_month` to `last_month` as (start, end), the
+    first and last day. The months are swapped if given the wrong way round.
+    """
+    if first_month > last_month:
+        first_month, last_month = last_month, first_month
+    return first_month.replace(day=1), month_end(last_month)
+
+
+def default_analytics_period(today=None):
+    """
+    The report's default period as (start, end): the last twelve whole months,
+    including the current one.
+    """
+    this_month = (today or timezone.localdate()).replace(day=1)
+    if this_month.month == 12:
+        first_month = this_month.replace(month=1)
+    else:
+        first_month = this_month.replace(year=this_month.year - 1, month=this_month.month + 1)
+    return analytics_period(first_month, this_month)
+
+
+def get_repair_analytics(start, end, today=None):
+    """
+    Return the current site's repair report for repairs started between
+    `start` and `end` (inclusive), from the cache when possible.
+    """
+    site = current_site()
+    today = today or timezone.localdate()
+    version = cache.get_or_set(VERSION_CACHE_KEY.format(site=site), 1, None)
+    # Which open repairs are overdue depends on the day, so reports are per day too
+    key = f'repair-analytics:{site}:{version}:{today.isoformat()}:{start.isoformat()}:{end.isoformat()}'
+    return cache.get_or_set(key, lambda: build_repair_analytics(start, end, today), REPORT_TIMEOUT)
+
+
+def _days(duration):
+    return round(duration.total_seconds() / 86400, 1) if duration is not None else None
+
+
+def _money(amount):
+    return float(amount) if amount is not None else 0.0
+
+
+def build_repair_analytics(start, end, today=None):
+    """
+    Compute the report with aggregate queries; no rows are loaded into Python
+    except the grouped results. All queries are restricted to the period
+    through the start_date index.
+    """
+    today = today or timezone.localdate()
+    repairs = RepairLog.objects.filter(start_date__gte=start, start_date__lte=end).order_by()
+    turnaround = ExpressionWrapper(F('end_date') - F('start_date'), output_field=DurationField())
+    completed = repairs.filter(end_date__isnull=False).annotate(turnaround=turnaround)
+
+    spend_by_company = list(
+        repairs.annotate(month=TruncMonth('start_date'))
+        .values('month', 'repair_company')
+        .annotate(total=Sum('cost'), repairs=Count('pk'))
+        .order_by('month', 'repair_company')
+    )
+    spend_by_category = list(
+        repairs.annotate(month=TruncMonth('start_date'))
+        .values('month', 'item__category')
+        .annotate(total=Sum('cost'), repairs=Count('pk'))
+        .order_by('month', 'item__category')
+    )
+    company_turnaround = list(
+        completed.values('repair_company')
+        .annotate(mean=Avg('turnaround'), repairs=Count('pk'), total=Sum('cost'))
+        .order_by('repair_company')
+    )
+
+    # The p-th percentile is the shortest turnaround whose cumulative
+    # distribution reaches p; the window function ranks in the database
+    ranked = completed.annotate(rank=Window(CumeDist(), order_by=F('turnaround').asc()))
+    percentiles = {}
+    for percent in TURNAROUND_PERCENTILES:
+        row = ranked.filter(rank__gte=percent / 100).order_by('turnaround').values_list('turnaround', flat=True)[:1]
+        percentiles[f'p{percent}'] = _days(row[0]) if row else None
+
+    # A repair is overdue if it came back after its expected date, or is
+    # still out past it
+    overdue = repairs.filter(expected_return_date__isnull=False).aggregate(
+        with_expected=Count('pk'),
+        overdue=Count('pk', filter=(
+            Q(end_date__gt=F('expected_return_date')) |
+            Q(is_active=True, expected_return_date__lt=today)
+        )),
+    )
+    totals = repairs.aggregate(total=Sum('cost'), repairs=Count('pk'), mean=Avg(turnaround))
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'total_spend': _money(totals['total']),
+        'repairs': totals['repairs'],
+        'turnaround_days': {'mean': _days(totals['mean']), **percentiles},
+        'overdue': {
+            'repairs': overdue['overdue'],
+            'with_expected_date': overdue['with_expected'],
+            'rate': round(overdue['overdue'] / overdue['with_expected'], 3) if overdue['with_expected'] else None,
+        },
+        'spend_by_company': [
+            {'month': row['month'].strftime('%Y-%m'), 'company': row['repair_company'],
+             'total': _money(row['total']), 'repairs': row['repairs']}
+            for row in spend_by_company
+        ],
+        'spend_by_category': [
+            {'month': row['month'].strftime('%Y-%m'), 'category': row['item__category'],
+             'total': _money(row['total']), 'repairs': row['repairs']}
+            for row in spend_by_category
+        ],
+        'companies': [
+            {'company': row['repair_company'], 'mean_turnaround_days': _days(row['mean']),
+             'completed_repairs': row['repairs'], 'total': _money(row['total'])}
+            for row in company_turnaround
+        ],
+    }
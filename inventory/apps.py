@@ -6,13 +6,31 @@ class InventoryConfig(AppConfig):
     name = 'inventory'
 
     def ready(self):
-        from django.db.models.signals import post_save, pre_save
-        from . import signals
-        from .models import Pump, Valve, Filter, MixTank, CommandCenter, Misc
+        from django.db.models.signals import post_migrate, post_save, pre_migrate, pre_save
+        from django.db.backends.signals import connection_created
+        from . import analytics, reference, routers, signals, sqlite
+        from .models import Pump, Valve, Filter, MixTank, CommandCenter, Misc, RepairLog, Status
 
         ITEM_MODELS = [Pump, Valve, Filter, MixTank, CommandCenter, Misc]
 
         # Loop through all our specific item models and connect the signals
         for model in ITEM_MODELS:
             pre_save.connect(signals.store_old_instance_on_save, sender=model)
+            pre_save.connect(signals.sync_location_text, sender=model)
             post_save.connect(signals.log_item_change, sender=model)
+            post_save.connect(signals.index_item_trigrams, sender=model)
+            if hasattr(model, 'SPEC_FIELDS'):
+                pre_save.connect(signals.sync_spec_values, sender=model)
+
+        # Any change to a repair makes the cached analytics reports stale
+        post_save.connect(analytics.invalidate_repair_analytics, sender=RepairLog)
+        post_delete.connect(analytics.invalidate_repair_analytics, sender=RepairLog)
+        post_save.connect(reference.invalidate_statuses, sender=Status)
+        post_delete.connect(reference.invalidate_statuses, sender=Status)
+
+        # Data migrations run against whichever site database is being migrated
+        pre_migrate.connect(routers.begin_migration, sender=self)
+        post_migrate.connect(routers.end_migration, sender=self)
+
+        # Apply the SQLite production profile to new connections when it is enabled
+        connection_created.connect(sqlite.configure_connection)
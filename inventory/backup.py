@@ -0,0 +1,430 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+MANIFEST_NAME = 'manifest.json'
+SNAPSHOT_NAME_FORMAT = '%Y%m%dT%H%M%S%fZ'
+# Held while a backup or a prune runs, so a prune never deletes the blobs of a
+# snapshot that is still being written
+LOCK_NAME = '.lock'
+# Threads hashing and copying media files
+MEDIA_WORKERS = 8
+HASH_CHUNK_SIZE = 1024 * 1024
+# A SQLite database not in WAL mode is copied this many pages at a time,
+# sleeping in between so writers get the lock, and given up on when writes
+# keep forcing the copy to start over
+SQLITE_STEP_PAGES = 1024
+SQLITE_STEP_SLEEP = 0.01
+SQLITE_MAX_RESTARTS = 20
+
+
+class BackupError(Exception):
+    pass
+
+
+def backup_root():
+    return Path(settings.BACKUP_ROOT)
+
+
+def _snapshots_dir(root):
+    return Path(root) / 'snapshots'
+
+
+def _objects_dir(root):
+    return Path(root) / 'objects'
+
+
+def _object_path(root, digest):
+    return _objects_dir(root) / digest[:2] / digest
+
+
+@contextmanager
+def _backup_lock(root):
+    """
+    Hold the exclusive lock on backup store `root`, waiting for it if another
+    process has it.
+    """
+    # POSIX only, and only needed here: the rest of the module (restores,
+    # listing and verifying snapshots) works without it
+    import fcntl
+
+    Path(root).mkdir(parents=True, exist_ok=True)
+    with open(Path(root) / LOCK_NAME, 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backup_databases():
+    """
+    The aliases to back up: every site's database (replicas are copies).
+    """
+    return sorted(set(settings.INVENTORY_SITES.values()))
+
+
+# Databases
+
+def _sqlite_integrity_check(path):
+    connection = sqlite3.connect(path)
+    try:
+        result = connection.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        connection.close()
+    if result != 'ok':
+        raise BackupError(f"{path} failed the integrity check: {result}")
+
+
+def _pg_environment(settings_dict):
+    environment = dict(os.environ)
+    if settings_dict.get('PASSWORD'):
+        environment['PGPASSWORD'] = settings_dict['PASSWORD']
+    return environment
+
+
+def _pg_arguments(settings_dict):
+    arguments = ['--dbname', settings_dict['NAME']]
+    for option, key in [('--host', 'HOST'), ('--port', 'PORT'), ('--username', 'USER')]:
+        if settings_dict.get(key):
+            arguments += [option, str(settings_dict[key])]
+    return arguments
+
+
+def _run(command, settings_dict):
+    result = subprocess.run(command, env=_pg_environment(settings_dict), capture_output=True, text=True)
+    if result.returncode:
+        raise BackupError(f"{command[0]} failed: {result.stderr.strip()}")
+
+
+def sqlite_backup(source, target):
+    """
+    Copy the open SQLite database `source` into `target` with the online
+    backup API.
+
+    In WAL mode the copy is made in a single step: it reads one consistent
+    snapshot and writers carry on meanwhile. Otherwise a single step would
+    hold the read lock, and so block every writer, for the whole copy, so it
+    is copied SQLITE_STEP_PAGES at a time instead. Each write from another
+    connection between steps makes the copy start over, and after
+    SQLITE_MAX_RESTARTS of those it gives up with a BackupError.
+    """
+    if source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal':
+        source.backup(target)
+        return
+
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        # A step that went through without getting any closer started over
+        if status == sqlite3.SQLITE_OK and last_remaining is not None and remaining >= last_remaining:
+            restarts += 1
+            if restarts > SQLITE_MAX_RESTARTS:
+                raise BackupError(
+                    f"The database kept changing: the copy started over {SQLITE_MAX_RESTARTS} times. "
+                    f"Switch it to WAL mode (PRAGMA journal_mode=WAL) or back up at a quieter time."
+                )
+        last_remaining = remaining
+        # The backup API only sleeps when a step finds the database locked
+        time.sleep(SQLITE_STEP_SLEEP)
+
+    source.backup(target, pages=SQLITE_STEP_PAGES, progress=progress, sleep=SQLITE_STEP_SLEEP)
+
+
+def backup_database(alias, directory):
+    """
+    Copy database `alias` into `directory` while the app keeps running and
+    return its manifest entry.
+
+    SQLite is copied by sqlite_backup(), and the copy must pass PRAGMA
+    integrity_check. PostgreSQL is written by pg_dump in its compressed
+    custom format, which pg_restore can load with several jobs in parallel,
+    and must be readable by pg_restore --list.
+    """
+    connection = connections[alias]
+    if connection.vendor == 'sqlite':
+        path = Path(directory) / f'{alias}.sqlite3'
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            sqlite_backup(connection.connection, target)
+            # A copy of a WAL database is in WAL mode too; keep the snapshot a single file
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+        _sqlite_integrity_check(path)
+    elif connection.vendor == 'postgresql':
+        path = Path(directory) / f'{alias}.dump'
+        settings_dict = connection.settings_dict
+        _run(['pg_dump', '--format=custom', '--no-owner', '--file', str(path), *_pg_arguments(settings_dict)],
+             settings_dict)
+        _run(['pg_restore', '--list', str(path)], settings_dict)
+    else:
+        raise BackupError(f"Can't back up a {connection.vendor} database ({alias}).")
+    return {'vendor': connection.vendor, 'file': path.name, 'size': path.stat().st_size, 'sha256': file_sha256(path)}
+
+
+def restore_database(alias, path, jobs=None):
+    """
+    Replace the contents of database `alias` with the backup at `path`.
+    """
+    connection = connections[alias]
+    if connection.vendor == 'sqlite':
+        source = sqlite3.connect(path)
+        connection.ensure_connection()
+        try:
+            # One step: the live database is locked once and swapped whole
+            source.backup(connection.connection)
+        finally:
+            source.close()
+    elif connection.vendor == 'postgresql':
+        settings_dict = connection.settings_dict
+        _run(['pg_restore', '--clean', '--if-exists', '--no-owner', '--jobs', str(jobs or os.cpu_count() or 1),
+              *_pg_arguments(settings_dict), str(path)], settings_dict)
+    else:
+        raise BackupError(f"Can't restore a {connection.vendor} database ({alias}).")
+
+
+# Media
+
+def _media_files(media_root):
+    media_root = Path(media_root)
+    if not media_root.is_dir():
+        return []
+    return [path for path in media_root.rglob('*') if path.is_file()]
+
+
+def snapshot_media(root, media_root, previous=None):
+    """
+    Store the files under `media_root` in the content-addressed object store
+    and return their manifest entries, keyed by path relative to
+    `media_root`, with a count of the files that had to be read.
+
+    A file whose size and modification time match the previous snapshot keeps
+    its hash without being read again, and a blob already in the store is
+    never copied twice, so unchanged documents cost one stat() each.
+    """
+    previous = previous or {}
+    media_root = Path(media_root)
+
+    def store(path):
+        name = path.relative_to(media_root).as_posix()
+        stat = path.stat()
+        known = previous.get(name)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            if _object_path(root, known['sha256']).exists():
+                return name, known, False
+        digest = file_sha256(path)
+        blob = _object_path(root, digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            partial = blob.with_name(f'.{blob.name}.{os.getpid()}.{threading.get_ident()}.partial')
+            shutil.copyfile(path, partial)
+            os.replace(partial, blob)
+        return name, {'sha256': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}, True
+
+    with ThreadPoolExecutor(max_workers=MEDIA_WORKERS) as executor:
+        results = list(executor.map(store, _media_files(media_root)))
+    return {name: entry for name, entry, read in results}, sum(read for name, entry, read in results)
+
+
+def restore_media(root, media, media_root, prune=False):
+    """
+    Bring `media_root` back to the files in a snapshot's `media` entries.
+    Files that already match by size and modification time are left alone.
+    With `prune`, files that aren't in the snapshot are deleted. Return the
+    number of files written and deleted.
+    """
+    media_root = Path(media_root)
+
+    def restore(item):
+        name, entry = item
+        path = media_root / name
+        try:
+            stat = path.stat()
+            if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+                return False
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f'.{path.name}.partial')
+        shutil.copyfile(_object_path(root, entry['sha256']), partial)
+        os.utime(partial, ns=(entry['mtime_ns'], entry['mtime_ns']))
+        os.replace(partial, path)
+        return True
+
+    with ThreadPoolExecutor(max_workers=MEDIA_WORKERS) as executor:
+        written = sum(executor.map(restore, media.items()))
+
+    deleted = 0
+    if prune:
+        for path in _media_files(media_root):
+            if path.relative_to(media_root).as_posix() not in media:
+                path.unlink()
+                deleted += 1
+    return written, deleted
+
+
+# Snapshots
+
+def list_snapshots(root=None):
+    """
+    Snapshot names, oldest first. The names sort by creation time.
+    """
+    directory = _snapshots_dir(root or backup_root())
+    if not directory.is_dir():
+        return []
+    # Snapshots still being written are hidden as .<name>.partial
+    return sorted(path.name for path in directory.iterdir()
+                  if not path.name.startswith('.') and (path / MANIFEST_NAME).exists())
+
+
+def load_manifest(name, root=None):
+    with open(_snapshots_dir(root or backup_root()) / name / MANIFEST_NAME) as file:
+        return json.load(file)
+
+
+def find_snapshot(at=None, root=None):
+    """
+    The latest snapshot taken at or before the aware datetime `at` (the
+    latest of all by default).
+    """
+    names = list_snapshots(root)
+    if at is not None:
+        names = [name for name in names if _snapshot_time(name) <= at]
+    if not names:
+        raise BackupError("No backup found" + (f" taken at or before {at.isoformat()}." if at else "."))
+    return names[-1]
+
+
+def _snapshot_time(name):
+    return datetime.strptime(name, SNAPSHOT_NAME_FORMAT).replace(tzinfo=dt_timezone.utc)
+
+
+def create_backup(root=None, media_root=None, now=None):
+    """
+    Take a snapshot of every database and of the media files. The snapshot
+    only appears under its name once it is complete and has passed
+    verify_snapshot(), media hashes included; otherwise it is deleted and
+    BackupError raised. Return the name and the manifest, with the number of
+    media files read.
+    """
+    root = Path(root or backup_root())
+    now = now or datetime.now(dt_timezone.utc)
+    with _backup_lock(root):
+        return _create_backup(root, media_root, now)
+
+
+def _create_backup(root, media_root, now):
+    name = now.strftime(SNAPSHOT_NAME_FORMAT)
+    existing = list_snapshots(root)
+    previous = load_manifest(existing[-1], root)['media'] if existing else {}
+
+    partial = _snapshots_dir(root) / f'.{name}.partial'
+    partial.mkdir(parents=True)
+    try:
+        databases = {alias: backup_database(alias, partial) for alias in backup_databases()}
+        media, media_read = snapshot_media(root, media_root or settings.MEDIA_ROOT, previous)
+        manifest = {'created': now.isoformat(), 'databases': databases, 'media': media}
+        with open(partial / MANIFEST_NAME, 'w') as file:
+            json.dump(manifest, file, indent=1, sort_keys=True)
+        problems = verify_snapshot(partial.name, root, rehash_media=True)
+        if problems:
+            raise BackupError(f"Backup {name} failed verification: {' '.join(problems)}")
+        os.replace(partial, _snapshots_dir(root) / name)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    return name, manifest, media_read
+
+
+def verify_snapshot(name, root=None, rehash_media=False):
+    """
+    Check a snapshot against its manifest: the database files' hashes, and
+    that every media blob exists with the right size (and hash, with
+    `rehash_media`). Return a list of problems, empty when it is sound.
+    """
+    root = Path(root or backup_root())
+    directory = _snapshots_dir(root) / name
+    manifest = load_manifest(name, root)
+    problems = []
+    for alias, entry in manifest['databases'].items():
+        path = directory / entry['file']
+        if not path.exists() or file_sha256(path) != entry['sha256']:
+            problems.append(f"Database backup {entry['file']} is missing or damaged.")
+
+    def check(item):
+        media_name, entry = item
+        blob = _object_path(root, entry['sha256'])
+        if not blob.exists() or blob.stat().st_size != entry['size']:
+            return f"Media file {media_name} is missing from the object store."
+        if rehash_media and file_sha256(blob) != entry['sha256']:
+            return f"Media file {media_name} is damaged in the object store."
+        return None
+
+    with ThreadPoolExecutor(max_workers=MEDIA_WORKERS) as executor:
+        problems += [problem for problem in executor.map(check, manifest['media'].items()) if problem]
+    return problems
+
+
+def restore_snapshot(name, root=None, media_root=None, prune_media=False, jobs=None):
+    """
+    Verify snapshot `name`, then restore every database in it and the media
+    files. Return the number of media files written and deleted.
+    """
+    root = Path(root or backup_root())
+    problems = verify_snapshot(name, root)
+    if problems:
+        raise BackupError(' '.join(problems))
+    manifest = load_manifest(name, root)
+    unknown = set(manifest['databases']) - set(connections.settings)
+    if unknown:
+        raise BackupError(f"The backup has databases that aren't configured: {', '.join(sorted(unknown))}.")
+
+    for alias, entry in manifest['databases'].items():
+        restore_database(alias, _snapshots_dir(root) / name / entry['file'], jobs)
+    return restore_media(root, manifest['media'], media_root or settings.MEDIA_ROOT, prune_media)
+
+
+def prune_snapshots(keep, root=None):
+    """
+    Delete all but the newest `keep` snapshots, and the media blobs no
+    remaining snapshot refers to. Return the names deleted.
+    """
+    root = Path(root or backup_root())
+    with _backup_lock(root):
+        names = list_snapshots(root)
+        removed = names[:-keep] if keep else names
+        for name in removed:
+            shutil.rmtree(_snapshots_dir(root) / name)
+
+        referenced = {entry['sha256'] for name in list_snapshots(root)
+                      for entry in load_manifest(name, root)['media'].values()}
+        objects = _objects_dir(root)
+        if objects.is_dir():
+            for blob in objects.glob('*/*'):
+                if blob.name not in referenced:
+                    blob.unlink()
+    return removed
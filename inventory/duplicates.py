@@ -0,0 +1,112 @@
+import math
+import re
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import BaseItem, ItemTrigram
+
+# Items at least this similar are reported as likely duplicates
+DEFAULT_THRESHOLD = 0.5
+# How many of the items sharing the most trigrams are scored exactly
+CANDIDATE_LIMIT = 50
+TRIGRAM_FIELDS = ['item_id', 'description', 'vendor']
+
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+
+def trigrams(text):
+    """
+    The set of trigrams in `text`, built the way pg_trgm does it: each
+    lower-cased word is padded with two spaces in front and one behind, so
+    'P-101' gives '  p', ' p ', '  1', ' 10', '101' and '01 '.
+    """
+    grams = set()
+    for word in WORD_PATTERN.findall((text or '').lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def item_trigrams(item):
+    return trigrams(' '.join(getattr(item, field) or '' for field in TRIGRAM_FIELDS))
+
+
+def index_item(item):
+    """
+    Bring the item's rows in the trigram index up to date.
+    """
+    grams = item_trigrams(item)
+    indexed = set(ItemTrigram.objects.filter(item_id=item.pk).values_list('gram', flat=True))
+    if grams == indexed:
+        return
+    with transaction.atomic():
+        ItemTrigram.objects.filter(item_id=item.pk, gram__in=indexed - grams).delete()
+        ItemTrigram.objects.bulk_create([ItemTrigram(gram=gram, item_id=item.pk) for gram in grams - indexed])
+
+
+def index_items(queryset, batch_size=1000):
+    """
+    Re-index every item in `queryset`, for changes made with update() or
+    bulk_create(), which skip the save signals.
+    """
+    items = queryset.order_by().only(*TRIGRAM_FIELDS)
+    ItemTrigram.objects.filter(item__in=queryset.order_by().values('pk')).delete()
+    ItemTrigram.objects.bulk_create(
+        (ItemTrigram(gram=gram, item_id=item.pk) for item in items.iterator() for gram in item_trigrams(item)),
+        batch_size=batch_size,
+    )
+
+
+def rebuild_index(batch_size=1000):
+    """
+    Rebuild the whole trigram index. Return the number of items indexed.
+    """
+    ItemTrigram.objects.all().delete()
+    indexed = last_pk = 0
+    while True:
+        batch = list(BaseItem.objects.filter(pk__gt=last_pk).order_by('pk').only(*TRIGRAM_FIELDS)[:batch_size])
+        if not batch:
+            return indexed
+        last_pk = batch[-1].pk
+        ItemTrigram.objects.bulk_create(
+            [ItemTrigram(gram=gram, item_id=item.pk) for item in batch for gram in item_trigrams(item)],
+            batch_size=batch_size,
+        )
+        indexed += len(batch)
+
+
+def find_similar(item, threshold=DEFAULT_THRESHOLD, limit=10):
+    """
+    Items whose trigram similarity to `item` is at least `threshold`, best
+    first, as (item, similarity) pairs. `item` may be unsaved.
+
+    Similarity is the number of shared trigrams over the number of distinct
+    trigrams in both, as in pg_trgm. Only items sharing enough trigrams to
+    reach the threshold are scored, and they are found through the gram index.
+    """
+    grams = item_trigrams(item)
+    if not grams:
+        return []
+
+    # An item can only reach the threshold if it shares at least this many
+    min_shared = math.ceil(threshold * len(grams))
+    candidates = ItemTrigram.objects.filter(gram__in=grams)
+    if item.pk:
+        candidates = candidates.exclude(item_id=item.pk)
+    shared = dict(
+        candidates.values('item').annotate(shared=Count('pk')).filter(shared__gte=min_shared)
+        .order_by('-shared').values_list('item', 'shared')[:CANDIDATE_LIMIT]
+    )
+    if not shared:
+        return []
+
+    totals = dict(
+        ItemTrigram.objects.filter(item__in=shared).values('item').annotate(total=Count('pk'))
+        .order_by().values_list('item', 'total')
+    )
+    scores = {pk: shared[pk] / (len(grams) + totals[pk] - shared[pk]) for pk in shared}
+    matches = sorted((pk for pk, score in scores.items() if score >= threshold), key=lambda pk: -scores[pk])[:limit]
+
+    items = BaseItem.objects.select_related('status').in_bulk(matches)
+    return [(items[pk], round(scores[pk], 3)) for pk in matches]
@@ -1,11 +1,11 @@
 from django import forms
-from .models import RepairLog, Pump, Valve, Filter, MixTank, CommandCenter, Misc
+from .models import RepairLog, Pump, Valve, Filter, MixTank, CommandCenter, Misc, Status, Location
 
 class PumpForm(forms.ModelForm):
     class Meta:
         model = Pump
         fields = [
-            'item_id', 'description', 'vendor', 'rating', 'location', 'status',
+            'item_id', 'description', 'vendor', 'rating', 'location', 'location_node', 'status',
             'speed', 'inlet', 'outlet', 'moc', 'power',
             'datasheet', 'manual', 'document1', 'document2', 'document3', 'document4', 'document5'
         ]
@@ -17,7 +17,7 @@ class ValveForm(forms.ModelForm):
     class Meta:
         model = Valve
         fields = [
-            'item_id', 'description', 'vendor', 'rating', 'location', 'status',
+            'item_id', 'description', 'vendor', 'rating', 'location', 'location_node', 'status',
             'moc', 'size', 'valve_type',
             'datasheet', 'manual', 'document1', 'document2', 'document3', 'document4', 'document5'
         ]
@@ -29,7 +29,7 @@ class FilterForm(forms.ModelForm):
     class Meta:
         model = Filter
         fields = [
-            'item_id', 'description', 'vendor', 'rating', 'location', 'status',
+            'item_id', 'description', 'vendor', 'rating', 'location', 'location_node', 'status',
             'inlet', 'outlet', 'moc', 'filter_type',
             'datasheet', 'manual', 'document1', 'document2', 'document3', 'document4', 'document5'
         ]
@@ -41,7 +41,7 @@ class MixTankForm(forms.ModelForm):
     class Meta:
         model = MixTank
         fields = [
-            'item_id', 'description', 'vendor', 'rating', 'location', 'status',
+            'item_id', 'description', 'vendor', 'rating', 'location', 'location_node', 'status',
             'inlet', 'outlet', 'moc', 'power',
             'datasheet', 'manual', 'document1', 'document2', 'document3', 'document4', 'document5'
         ]
@@ -52,7 +52,7 @@ class MixTankForm(forms.ModelForm):
 class CommandCenterForm(forms.ModelForm):
     class Meta:
         model = CommandCenter
-        fields = ['item_id', 'description', 'location', 'status',
+        fields = ['item_id', 'description', 'location', 'location_node', 'status',
                   'datasheet', 'manual', 'document1', 'document2', 'document3', 'document4', 'document5'
         ]
         widgets = {
@@ -63,7 +63,7 @@ class MiscForm(forms.ModelForm):
     class Meta:
         model = Misc
         fields = [
-            'item_id', 'description', 'vendor', 'rating', 'location', 'status',
+            'item_id', 'description', 'vendor', 'rating', 'location', 'location_node', 'status',
             'speed', 'inlet', 'outlet', 'moc', 'power', 'quantity',
             'datasheet', 'manual', 'document1', 'document2', 'document3', 'document4', 'document5'
         ]
@@ -95,4 +95,28 @@ class RepairLogForm(forms.ModelForm):
         labels = {
             'description': 'Repair Description',
             'cost': 'Estimated/Final Cost',
-        }
\ No newline at end of file
+        }
+
+
+class BulkEditForm(forms.Form):
+    """
+    Changes applied to many items at once from the item list. Fields left
+    empty are not changed.
+    """
+    SCOPE_CHOICES = [
+        ('selected', 'Selected items'),
+        ('filtered', 'All items matching the current filter'),
+    ]
+
+    scope = forms.ChoiceField(choices=SCOPE_CHOICES, initial='selected')
+    status = forms.ModelChoiceField(queryset=Status.objects.order_by('name'), required=False,
+                                    empty_label="(keep status)")
+    location_node = forms.ModelChoiceField(queryset=Location.objects.all(), required=False,
+                                           empty_label="(keep location)", label="Storage location")
+    vendor = forms.CharField(max_length=100, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not any(cleaned_data.get(name) for name in ['status', 'location_node', 'vendor']):
+            raise forms.ValidationError("Choose at least one change to apply.")
+        return cleaned_data
@@ -0,0 +1,301 @@
+import hashlib
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import qrcode
+except ImportError:  # QR codes are optional; without them labels carry the barcode only
+    qrcode = None
+
+# Bar/space widths of each Code 128 symbol, by value. 103-105 are the start
+# codes for code sets A, B and C; 106 is the stop code.
+CODE128_PATTERNS = [
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213', '122312', '132212', '221213',
+    '221312', '231212', '112232', '122132', '122231', '113222', '123122', '123221', '223211', '221132',
+    '221231', '213212', '223112', '312131', '311222', '321122', '321221', '312212', '322112', '322211',
+    '212123', '212321', '232121', '111323', '131123', '131321', '112313', '132113', '132311', '211313',
+    '231113', '231311', '112133', '112331', '132131', '113123', '113321', '133121', '313121', '211331',
+    '231131', '213113', '213311', '213131', '311123', '311321', '331121', '312113', '312311', '332111',
+    '314111', '221411', '431111', '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114', '413111', '241112', '134111',
+    '111242', '121142', '121241', '114212', '124112', '124211', '411212', '421112', '421211', '212141',
+    '214121', '412121', '111143', '111341', '131141', '114113', '114311', '411113', '411311', '113141',
+    '114131', '311141', '411131', '211412', '211214', '211232', '2331112',
+]
+CODE128_START_B, CODE128_START_C = 104, 105
+CODE128_CODE_B, CODE128_CODE_C = 100, 99
+CODE128_STOP = 106
+
+# Avery 5160 / 8160 address labels: 3 x 10 labels of 2.625" x 1" on US Letter.
+# All sizes are in PDF points (1/72").
+PAGE_SIZE = (612, 792)
+LABEL_SIZE = (189, 72)
+LABEL_COLUMNS, LABEL_ROWS = 3, 10
+LABEL_ORIGIN = (13.5, 36)  # Left and top margins
+LABEL_PITCH = (198, 72)
+LABELS_PER_PAGE = LABEL_COLUMNS * LABEL_ROWS
+LABEL_PADDING = 6
+
+# Part of the cache key; change it whenever the label drawing changes
+LABEL_CACHE_VERSION = 1
+LABEL_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _code128_values(text):
+    """
+    Symbol values for `text`, starting with a start code. Text is encoded in
+    code set B; runs of digits long enough to gain from it switch to code set
+    C, which packs two digits per symbol. Characters outside printable ASCII
+    become '?'.
+    """
+    values, code_set = [], None
+    position = 0
+    while position < len(text):
+        run = 0
+        while position + run < len(text) and text[position + run].isdigit() and text[position + run].isascii():
+            run += 1
+        edge = position == 0 or position + run == len(text)
+        if run >= (4 if edge else 6):
+            if run % 2:
+                run -= 1
+                values += [CODE128_START_B] if code_set is None else [CODE128_CODE_B] if code_set == 'C' else []
+                code_set = 'B'
+                values.append(ord(text[position]) - 32)
+                position += 1
+            values.append(CODE128_START_C if code_set is None else CODE128_CODE_C)
+            code_set = 'C'
+            values += [int(text[start:start + 2]) for start in range(position, position + run, 2)]
+            position += run
+        else:
+            if code_set != 'B':
+                values.append(CODE128_START_B if code_set is None else CODE128_CODE_B)
+                code_set = 'B'
+            char = text[position]
+            values.append(ord(char) - 32 if 32 <= ord(char) < 127 else ord('?') - 32)
+            position += 1
+    return values or [CODE128_START_B]
+
+
+def code128_widths(text):
+    """
+    Encode `text` as Code 128 and return the bar and space widths in modules,
+    starting with a bar.
+    """
+    values = _code128_values(text)
+    checksum = (values[0] + sum(position * value for position, value in enumerate(values[1:], 1))) % 103
+    values += [checksum, CODE128_STOP]
+    return [int(width) for value in values for width in CODE128_PATTERNS[value]]
+
+
+def qr_matrix(data):
+    """
+    The QR code modules for `data` as rows of booleans, or None without the
+    qrcode package.
+    """
+    if qrcode is None:
+        return None
+    # A fixed mask pattern skips scoring all eight, which is most of the work
+    code = qrcode.QRCode(border=0, error_correction=qrcode.constants.ERROR_CORRECT_M, mask_pattern=0)
+    code.add_data(data)
+    code.make(fit=True)
+    return code.get_matrix()
+
+
+def _number(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.')
+
+
+def _pdf_text(text):
+    escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return escaped.encode('latin-1', 'replace').decode('latin-1')
+
+
+def render_label(item_id, url):
+    """
+    Draw one label as PDF content stream operators, in label coordinates with
+    the origin at its bottom left: the item's URL as a QR code on the left, and
+    `item_id` as a Code 128 barcode with the text below it on the right.
+
+    Only vector rectangles and text are used, so the result is a few KB and
+    prints sharply at any resolution. Runs in the label worker processes.
+    """
+    width, height = LABEL_SIZE
+    operators = []
+    left = LABEL_PADDING
+
+    matrix = qr_matrix(url)
+    if matrix:
+        size = height - 2 * LABEL_PADDING
+        module = size / len(matrix)
+        for row_number, row in enumerate(matrix):
+            y = height - LABEL_PADDING - (row_number + 1) * module
+            column = 0
+            # One rectangle per run of dark modules keeps the stream small
+            while column < len(row):
+                if row[column]:
+                    start = column
+                    while column < len(row) and row[column]:
+                        column += 1
+                    operators.append(f'{_number(LABEL_PADDING + start * module)} {_number(y)} '
+                                     f'{_number((column - start) * module)} {_number(module)} re')
+                else:
+                    column += 1
+        left += size + LABEL_PADDING
+
+    widths = code128_widths(item_id)
+    # Quiet zones of 10 modules either side
+    module = min(1.0, (width - left - LABEL_PADDING) / (sum(widths) + 20))
+    x = left + 10 * module
+    bar_bottom, bar_height = LABEL_PADDING + 14, height - 2 * LABEL_PADDING - 14
+    for position, bar_width in enumerate(widths):
+        if position % 2 == 0:
+            operators.append(f'{_number(x)} {_number(bar_bottom)} {_number(bar_width * module)} '
+                             f'{_number(bar_height)} re')
+        x += bar_width * module
+    operators.append('f')
+
+    operators.append(f'BT /F1 9 Tf {_number(left)} {_number(LABEL_PADDING + 2)} Td ({_pdf_text(item_id)}) Tj ET')
+    return '\n'.join(operators).encode('latin-1')
+
+
+def _render_labels(labels):
+    return [render_label(item_id, url) for item_id, url in labels]
+
+
+def _cache_key(item_id, url):
+    digest = hashlib.sha256(f'{item_id}\0{url}'.encode()).hexdigest()
+    return f'label:{LABEL_CACHE_VERSION}:{digest}'
+
+
+_executor = None
+
+
+def _get_executor():
+    """
+    The shared pool of label worker processes, or None to render in-process
+    (LABEL_RENDER_PROCESSES of 0 or 1).
+    """
+    global _executor
+    if _render_processes() <= 1:
+        return None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=_render_processes())
+    return _executor
+
+
+def _render_processes():
+    return getattr(settings, 'LABEL_RENDER_PROCESSES', 0)
+
+
+class _PageJob:
+    """
+    The labels for one page: cached ones are ready at once, the rest are
+    rendered by the worker processes while the previous page is written out.
+    """
+
+    def __init__(self, labels, executor):
+        self.keys = [_cache_key(*label) for label in labels]
+        self.drawings = cache.get_many(self.keys)
+        missing = [(key, label) for key, label in zip(self.keys, labels) if key not in self.drawings]
+        self.missing_keys = [key for key, label in missing]
+        missing_labels = [label for key, label in missing]
+
+        self.futures = []
+        if missing_labels and executor:
+            # A few labels per task so every worker gets a share of the page
+            size = max(1, len(missing_labels) // (2 * _render_processes()))
+            self.futures = [executor.submit(_render_labels, missing_labels[start:start + size])
+                            for start in range(0, len(missing_labels), size)]
+        elif missing_labels:
+            self.drawings.update(zip(self.missing_keys, _render_labels(missing_labels)))
+            cache.set_many({key: self.drawings[key] for key in self.missing_keys}, LABEL_CACHE_TIMEOUT)
+
+    def result(self):
+        if self.futures:
+            rendered = dict(zip(self.missing_keys, (drawing for future in self.futures for drawing in future.result())))
+            cache.set_many(rendered, LABEL_CACHE_TIMEOUT)
+            self.drawings.update(rendered)
+        return [self.drawings[key] for key in self.keys]
+
+
+def _page_stream(drawings):
+    """
+    Place the label drawings on a sheet, left to right and top to bottom.
+    """
+    parts = []
+    for position, drawing in enumerate(drawings):
+        row, column = divmod(position, LABEL_COLUMNS)
+        x = LABEL_ORIGIN[0] + column * LABEL_PITCH[0]
+        y = PAGE_SIZE[1] - LABEL_ORIGIN[1] - (row + 1) * LABEL_PITCH[1]
+        parts.append(b'q 1 0 0 1 %s %s cm\n%s\nQ' % (_number(x).encode(), _number(y).encode(), drawing))
+    return b'\n'.join(parts)
+
+
+def _pages(labels, executor):
+    """
+    Yield the label drawings page by page. The next page's labels are
+    handed to the workers before the current page is returned, so rendering
+    overlaps with writing the PDF.
+    """
+    page, pending = [], None
+    for label in labels:
+        page.append(label)
+        if len(page) == LABELS_PER_PAGE:
+            job = _PageJob(page, executor)
+            if pending:
+                yield pending.result()
+            pending, page = job, []
+    if page:
+        job = _PageJob(page, executor)
+        if pending:
+            yield pending.result()
+        pending = job
+    if pending:
+        yield pending.result()
+
+
+def label_sheet_pdf(labels):
+    """
+    Yield a PDF of label sheets, chunk by chunk, for `labels`: an iterable of
+    (item_id, url) pairs that is consumed lazily. Only one page of labels is
+    held in memory at a time; the page tree and cross-reference table are
+    written at the end, once the number of pages is known.
+    """
+    offsets = {}
+    position = 0
+
+    def write(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        position += len(chunk)
+        return chunk
+
+    # 1 is the catalog, 2 the page tree (written last), 3 the font
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header
+    yield write(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    yield write(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+
+    page_numbers = []
+    number = 4
+    for drawings in _pages(labels, _get_executor()):
+        content = zlib.compress(_page_stream(drawings))
+        yield write(number, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(content), content))
+        yield write(number + 1, b'<< /Type /Page /Parent 2 0 R /Contents %d 0 R '
+                                b'/Resources << /Font << /F1 3 0 R >> >> >>' % number)
+        page_numbers.append(number + 1)
+        number += 2
+
+    kids = b' '.join(b'%d 0 R' % page for page in page_numbers)
+    yield write(2, b'<< /Type /Pages /Kids [%s] /Count %d /MediaBox [0 0 %d %d] >>'
+                % (kids, len(page_numbers), *PAGE_SIZE))
+
+    xref = [b'xref\n0 %d\n0000000000 65535 f \n' % number]
+    xref += [b'%010d 00000 n \n' % offsets[object_number] for object_number in range(1, number)]
+    yield b''.join(xref)
+    yield b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (number, position)
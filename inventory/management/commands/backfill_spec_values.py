@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.models import Pump, Valve, Filter, MixTank
+from inventory.units import apply_spec_values
+
+SPEC_MODELS = [Pump, Valve, Filter, MixTank]
+
+
+class Command(BaseCommand):
+    help = "Parse the free-text spec fields of existing items into their numeric value/unit columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        for model in SPEC_MODELS:
+            text_fields = list(model.SPEC_FIELDS)
+            parsed_fields = [f'{name}_{suffix}' for name in text_fields for suffix in ['value', 'unit']]
+            last_pk = 0
+            seen = updated = 0
+
+            # Walk the table in primary key order so each batch is an index range
+            # and the command can be stopped and re-run at any time
+            while True:
+                batch = list(
+                    model.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .only(*text_fields, *parsed_fields)[:batch_size]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                seen += len(batch)
+
+                changed = [item for item in batch if apply_spec_values(item)]
+                if changed:
+                    # bulk_update skips the save signals, so no history entries are written
+                    with transaction.atomic():
+                        model.objects.bulk_update(changed, parsed_fields)
+                    updated += len(changed)
+
+            self.stdout.write(f"{model._meta.verbose_name_plural.title()}: {updated} of {seen} updated")
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.backup import BackupError, create_backup, prune_snapshots
+
+
+class Command(BaseCommand):
+    help = ("Snapshot every site database and the media files into BACKUP_ROOT while the app keeps running. "
+            "Unchanged media files are stored once and not read again.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int,
+                            help="Afterwards delete all but the newest KEEP snapshots and unused media.")
+
+    def handle(self, *args, **options):
+        if options['keep'] is not None and options['keep'] < 1:
+            raise CommandError("--keep must be at least 1.")
+
+        started = time.perf_counter()
+        try:
+            name, manifest, media_read = create_backup()
+        except BackupError as error:
+            raise CommandError(error)
+
+        for alias, entry in manifest['databases'].items():
+            self.stdout.write(f"{alias}: {entry['size'] / 1e6:.1f} MB")
+        self.stdout.write(f"{len(manifest['media'])} media files, {media_read} new or changed.")
+        if options['keep'] is not None:
+            for removed in prune_snapshots(options['keep']):
+                self.stdout.write(f"Deleted backup {removed}.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Backup {name} written and verified in {time.perf_counter() - started:.1f}s."
+        ))
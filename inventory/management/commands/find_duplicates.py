@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from inventory.duplicates import DEFAULT_THRESHOLD, TRIGRAM_FIELDS, find_similar, rebuild_index
+from inventory.models import BaseItem
+
+
+class Command(BaseCommand):
+    help = "List pairs of items that are probably the same physical asset, by trigram similarity."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help="Minimum similarity (0-1) for a pair to be listed.")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Rebuild the trigram index first, e.g. after bulk imports.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            indexed = rebuild_index(options['batch_size'])
+            self.stdout.write(f"Indexed {indexed} items.")
+
+        pairs = last_pk = 0
+        while True:
+            batch = list(
+                BaseItem.objects.filter(pk__gt=last_pk).order_by('pk')
+                .only(*TRIGRAM_FIELDS)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            for item in batch:
+                for match, similarity in find_similar(item, options['threshold']):
+                    # Each pair is found from both sides; list it once
+                    if match.pk > item.pk:
+                        pairs += 1
+                        self.stdout.write(f"{item.item_id}\t{match.item_id}\t{similarity:.2f}")
+
+        self.stdout.write(self.style.SUCCESS(f"{pairs} likely duplicate pair{'s' if pairs != 1 else ''} found."))
@@ -0,0 +1,258 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from inventory.models import (
+    BaseItem, Status, LogEntry, Location, RepairLog, Pump, Valve, Filter, MixTank, CommandCenter, Misc
+)
+from inventory.duplicates import index_items
+from inventory.units import parse_quantity
+
+# Generated item IDs are the category prefix and a zero-padded number, e.g. P-0000123
+ITEM_NUMBER_DIGITS = 7
+
+# Item ID prefix and child model for each category
+CATEGORIES = {
+    'Pump': ('P', Pump),
+    'Filter': ('F', Filter),
+    'Mix Tank': ('MT', MixTank),
+    'Valve': ('V', Valve),
+    'Command Center': ('CC', CommandCenter),
+    'Misc': ('M', Misc),
+}
+
+STATUSES = ['Warehouse', 'Repair', 'In Service', 'Project Alpha', 'Project Beta', 'Scrapped']
+PROTECTED_STATUSES = {'Warehouse', 'Repair'}
+
+VENDORS = ['Grundfos', 'Goulds', 'Flowserve', 'Swagelok', 'Parker', 'Pall', 'Alfa Laval',
+           'Emerson', 'ABB', 'Siemens', 'Xylem', 'KSB']
+MATERIALS = ['316 SS', '304 SS', 'Carbon Steel', 'PVC', 'CPVC', 'Hastelloy', 'Cast Iron']
+REPAIR_COMPANIES = ['Acme Pump Repair', 'Valley Valve Service', 'Precision Rebuilds',
+                    'Tri-State Industrial', 'Rapid Motor Works']
+ACTIONS = ['Updated', 'Updated', 'Updated', 'Repair Started', 'Repair Updated', 'Repair Completed']
+
+SIZES = ['1/2"', '3/4"', '1"', '1-1/2"', '2"', '3"', '4"', '6"', '50 mm', '80 mm']
+POWERS = ['1 HP', '2 HP', '5 HP', '7.5 HP', '10 HP', '15 HP', '25 HP', '3.7 kW', '11 kW']
+SPEEDS = ['1150 RPM', '1750 RPM', '3450 RPM', '3600 rpm']
+
+
+@contextmanager
+def keep_timestamps(*fields):
+    """
+    Let generated objects keep their own auto_now / auto_now_add values so the
+    data is spread over time instead of all being stamped "now".
+    """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def insert_child_rows(model, rows):
+    """
+    bulk_create() refuses multi-table inherited models, so the child table rows
+    for items whose BaseItem rows already exist are inserted directly.
+    """
+    fields = model._meta.local_concrete_fields
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    values = [
+        [field.get_db_prep_save(row.get(field.attname, field.get_default()), connection) for field in fields]
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", values)
+
+
+class Command(BaseCommand):
+    help = "Fill the database with realistic synthetic inventory data for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000, help="Items to create, spread over all categories.")
+        parser.add_argument('--repairs', type=int, default=None,
+                            help="Repair logs to create (default: one for every fourth item).")
+        parser.add_argument('--log-entries', type=int, default=10000, help="History entries to create.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=3650, help="How far back the history goes.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.days = options['days']
+        self.location_nodes = {}
+        batch_size = options['batch_size']
+        repairs = options['repairs'] if options['repairs'] is not None else options['items'] // 4
+
+        statuses = self._create_statuses()
+        first_number = self._last_item_number()
+
+        created = 0
+        while created < options['items']:
+            count = min(batch_size, options['items'] - created)
+            self._create_items(first_number + created, count, statuses)
+            created += count
+            self.stdout.write(f"Items: {created}/{options['items']}", ending="\r")
+        self.stdout.write("")
+
+        self._create_repairs(repairs, batch_size)
+        self._create_log_entries(options['log_entries'], batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {options['items']} items, {repairs} repair logs and "
+            f"{options['log_entries']} history entries."
+        ))
+
+    def _random_datetime(self):
+        return self.now - timedelta(seconds=self.random.randint(0, self.days * 86400))
+
+    def _last_item_number(self):
+        """
+        The highest number in the generated item IDs already in the database,
+        so new ones carry on after it even when items have been deleted.
+        """
+        last = 0
+        for prefix, _ in CATEGORIES.values():
+            # Equal-width numbers sort as text, so the largest ID has the largest number
+            highest = BaseItem.objects.filter(
+                item_id__regex=rf'^{prefix}-[0-9]{{{ITEM_NUMBER_DIGITS}}}$'
+            ).aggregate(highest=Max('item_id'))['highest']
+            if highest:
+                last = max(last, int(highest.rsplit('-', 1)[1]))
+        return last
+
+    def _create_statuses(self):
+        statuses = []
+        for name in STATUSES:
+            status, _ = Status.objects.get_or_create(name=name, defaults={'is_protected': name in PROTECTED_STATUSES})
+            statuses.append(status)
+        return statuses
+
+    def _location_node(self, text):
+        # bulk_create() skips the signal that links the text to its location
+        if text not in self.location_nodes:
+            self.location_nodes[text] = Location.for_text(text)
+        return self.location_nodes[text]
+
+    def _specific_fields(self, model):
+        choice = self.random.choice
+        fields = {
+            'speed': choice(SPEEDS),
+            'inlet': choice(SIZES),
+            'outlet': choice(SIZES),
+            'moc': choice(MATERIALS),
+            'power': choice(POWERS),
+            'size': choice(SIZES),
+            'valve_type': choice(['Ball', 'Gate', 'Butterfly', 'Check', 'Globe']),
+            'filter_type': choice(['Cartridge', 'Bag', 'Basket', 'Membrane']),
+            'quantity': str(self.random.randint(1, 50)),
+        }
+        # Rows bypass save(), so fill the parsed spec columns here
+        for name, quantity in getattr(model, 'SPEC_FIELDS', {}).items():
+            fields[f'{name}_value'], fields[f'{name}_unit'] = parse_quantity(fields[name], quantity)
+
+        names = {field.attname for field in model._meta.local_concrete_fields}
+        return {name: value for name, value in fields.items() if name in names}
+
+    def _create_items(self, first_number, count, statuses):
+        # Weight the status choice so most items sit in the warehouse
+        weights = [60, 5, 20, 5, 5, 5]
+        category_names = list(CATEGORIES)
+
+        items = []
+        for n in range(first_number, first_number + count):
+            category = category_names[n % len(category_names)]
+            prefix, _ = CATEGORIES[category]
+            location = (f"Building {self.random.randint(1, 4)} / Aisle {self.random.randint(1, 20)} / "
+                        f"Bin {self.random.randint(1, 50)}")
+            location_node = self._location_node(location)
+            items.append(BaseItem(
+                item_id=f"{prefix}-{n + 1:0{ITEM_NUMBER_DIGITS}d}",
+                category=category,
+                description=f"{self.random.choice(MATERIALS)} {category.lower()} for line {self.random.randint(1, 40)}",
+                vendor=self.random.choice(VENDORS),
+                rating=f"{self.random.choice([150, 300, 600])} psi",
+                location=location_node.full_name,
+                location_node=location_node,
+                status=self.random.choices(statuses, weights)[0],
+                last_updated=self._random_datetime(),
+            ))
+
+        with transaction.atomic(), keep_timestamps(BaseItem._meta.get_field('last_updated')):
+            BaseItem.objects.bulk_create(items)
+
+            rows_by_model = {}
+            for item in items:
+                _, model = CATEGORIES[item.category]
+                row = {'baseitem_ptr_id': item.pk, **self._specific_fields(model)}
+                rows_by_model.setdefault(model, []).append(row)
+            for model, rows in rows_by_model.items():
+                insert_child_rows(model, rows)
+
+            # bulk_create() skips the signal that keeps the duplicate index current
+            index_items(BaseItem.objects.filter(pk__range=(items[0].pk, items[-1].pk)))
+
+    def _create_repairs(self, count, batch_size):
+        item_pks = list(BaseItem.objects.values_list('pk', flat=True))
+        if not item_pks or not count:
+            return
+
+        today = self.now.date()
+        batch = []
+        for n in range(count):
+            start = self._random_datetime().date()
+            expected = start + timedelta(days=self.random.randint(7, 60))
+            is_active = self.random.random() < 0.1
+            end = None if is_active else start + timedelta(days=self.random.randint(3, 90))
+            batch.append(RepairLog(
+                item_id=self.random.choice(item_pks),
+                repair_company=self.random.choice(REPAIR_COMPANIES),
+                contact_name="Service Desk",
+                start_date=start,
+                expected_return_date=expected,
+                end_date=min(end, today) if end else None,
+                description="Seal replacement and bearing inspection",
+                cost=Decimal(self.random.randint(15000, 2500000)) / 100,
+                is_active=is_active,
+            ))
+            if len(batch) >= batch_size:
+                RepairLog.objects.bulk_create(batch)
+                batch = []
+        RepairLog.objects.bulk_create(batch)
+
+    def _create_log_entries(self, count, batch_size):
+        item_ids = list(BaseItem.objects.values_list('item_id', flat=True)[:100000])
+        users = list(User.objects.all()[:20]) or [None]
+        if not item_ids:
+            return
+
+        created = 0
+        with keep_timestamps(LogEntry._meta.get_field('timestamp')):
+            while created < count:
+                size = min(batch_size, count - created)
+                LogEntry.objects.bulk_create([
+                    LogEntry(
+                        timestamp=self._random_datetime(),
+                        user=self.random.choice(users),
+                        action=self.random.choice(ACTIONS),
+                        item_id_str=self.random.choice(item_ids),
+                        details=f"Location from 'Bin {self.random.randint(1, 50)}' to "
+                                f"'Bin {self.random.randint(1, 50)}'",
+                    )
+                    for _ in range(size)
+                ])
+                created += size
+                self.stdout.write(f"History entries: {created}/{count}", ending="\r")
+        self.stdout.write("")
@@ -0,0 +1,211 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from inventory.models import BaseItem
+from inventory.views import FORM_MAP
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'loadtest_baseline.json'
+
+# Scenario name -> whether it needs a logged in user
+SCENARIOS = {
+    'item_list': False,
+    'item_list_search': False,
+    'item_list_print': False,
+    'item_detail': False,
+    'log_history': True,
+    'edit_item': True,
+    'edit_item_post': True,
+}
+
+
+def percentile(sorted_values, percent):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(percent / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """
+    Return a list of human readable regressions of `report` against `baseline`.
+    Latency may grow by `tolerance` (0.2 = 20%); query counts may not grow at all.
+    """
+    regressions = []
+    for name, stats in report['scenarios'].items():
+        expected = baseline.get('scenarios', {}).get(name)
+        if not expected:
+            continue
+        if stats['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {stats['p95_ms']:.1f}ms vs baseline {expected['p95_ms']:.1f}ms")
+        if stats['max_queries'] > expected['max_queries']:
+            regressions.append(f"{name}: {stats['max_queries']} queries vs baseline {expected['max_queries']}")
+    return regressions
+
+
+def _edit_form_data(item):
+    """
+    POST data for edit_item that re-submits the item with a new description.
+    """
+    category_slug = item.category.lower().replace(' ', '')
+    instance = getattr(item, category_slug, item)
+    form = FORM_MAP[category_slug](instance=instance)
+    data = {}
+    for name, field in form.fields.items():
+        if field.widget.needs_multipart_form:
+            continue
+        value = form[name].value()
+        data[name] = '' if value is None else value
+    data['description'] = f"Load test edit {time.time()}"
+    return data
+
+
+class Command(BaseCommand):
+    help = "Drive the inventory URLs with concurrent clients and report latency, throughput and queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=4, help="Concurrent clients (threads).")
+        parser.add_argument('--requests', type=int, default=50, help="Requests per scenario.")
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--username', help="User for the login-only scenarios (default: first superuser).")
+        parser.add_argument('--save-baseline', nargs='?', const=str(DEFAULT_BASELINE), metavar='PATH',
+                            help="Store the results as the new baseline.")
+        parser.add_argument('--baseline', nargs='?', const=str(DEFAULT_BASELINE), metavar='PATH',
+                            help="Compare against a stored baseline and fail on regressions.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed p95 latency growth over the baseline (default 0.25).")
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['username'])
+        self.item_pks = list(BaseItem.objects.values_list('pk', flat=True)[:10000])
+        if not self.item_pks:
+            raise CommandError("There are no items. Run 'manage.py generate_inventory' first.")
+
+        scenarios = [name for name in options['scenarios'] if user or not SCENARIOS[name]]
+        skipped = set(options['scenarios']) - set(scenarios)
+        if skipped:
+            self.stderr.write(f"Skipping {', '.join(sorted(skipped))}: no user to log in as.")
+
+        self.local = threading.local()
+        self.user = user
+
+        report = {'clients': options['clients'], 'requests': options['requests'],
+                  'items': BaseItem.objects.count(), 'scenarios': {}}
+        for name in scenarios:
+            report['scenarios'][name] = self._run_scenario(name, options['clients'], options['requests'])
+
+        self._print_report(report)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Baseline saved to {options['save_baseline']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = compare_to_baseline(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User '{username}' does not exist.")
+        return User.objects.filter(is_superuser=True).first()
+
+    def _client(self):
+        # One client (and so one session and DB connection) per thread
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(SERVER_NAME='localhost')
+            if self.user:
+                client.force_login(self.user)
+        return client
+
+    def _request(self, name):
+        client = self._client()
+        pk = random.choice(self.item_pks)
+
+        if name == 'item_list':
+            call = lambda: client.get(reverse('item_list'))
+        elif name == 'item_list_search':
+            call = lambda: client.get(reverse('item_list'), {'q': random.choice(['pump', 'valve', 'Building 2'])})
+        elif name == 'item_list_print':
+            call = lambda: client.get(reverse('item_list'), {'format': 'print'})
+        elif name == 'item_detail':
+            call = lambda: client.get(reverse('item_detail', args=[pk]))
+        elif name == 'log_history':
+            call = lambda: client.get(reverse('log_history'))
+        elif name == 'edit_item':
+            call = lambda: client.get(reverse('edit_item', args=[pk]))
+        else:
+            data = _edit_form_data(BaseItem.objects.get(pk=pk))
+            call = lambda: client.post(reverse('edit_item', args=[pk]), data)
+
+        # Count every query on every alias; execute_wrapper has no logging cap
+        queries = []
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(
+                    lambda execute, *args: queries.append(1) or execute(*args)
+                ))
+            started = time.perf_counter()
+            try:
+                response = call()
+                if response.streaming:
+                    # A streamed page does its queries and rendering as it is read
+                    for chunk in response.streaming_content:
+                        pass
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+
+        return elapsed, len(queries), ok
+
+    def _run_scenario(self, name, clients, requests):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = list(pool.map(lambda _: self._request(name), range(requests)))
+        wall_time = time.perf_counter() - started
+
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in results)
+        queries = [count for _, count, _ in results]
+        return {
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'throughput_rps': round(len(results) / wall_time, 1),
+            'mean_queries': round(sum(queries) / len(queries), 1),
+            'max_queries': max(queries),
+            'errors': sum(1 for _, _, ok in results if not ok),
+        }
+
+    def _print_report(self, report):
+        self.stdout.write(
+            f"{report['items']} items, {report['clients']} clients, {report['requests']} requests per scenario\n"
+        )
+        self.stdout.write(f"{'scenario':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}"
+                          f"{'queries':>9}{'errors':>8}")
+        for name, stats in report['scenarios'].items():
+            self.stdout.write(
+                f"{name:<18}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+                f"{stats['throughput_rps']:>9.1f}{stats['mean_queries']:>9.1f}{stats['errors']:>8}"
+            )
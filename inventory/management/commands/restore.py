@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from inventory.backup import BackupError, find_snapshot, list_snapshots, restore_snapshot, verify_snapshot
+
+
+def _point_in_time(value):
+    # A date on its own means the end of that day
+    try:
+        moment = parse_datetime(f'{value}T23:59:59.999999') if parse_date(value) else parse_datetime(value)
+    except ValueError:
+        # Well formed but impossible, like 2026-02-30
+        moment = None
+    if moment is None:
+        raise CommandError(f"Can't read '{value}' as a date or time.")
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class Command(BaseCommand):
+    help = ("Restore the site databases and media files from a backup: the latest, the one named, "
+            "or the latest taken at or before --at. Stop the app first.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot', nargs='?', help="Backup name, as listed by --list.")
+        parser.add_argument('--at', help="Restore the state as of this date or time, e.g. 2026-10-01T08:00.")
+        parser.add_argument('--list', action='store_true', help="List the backups and exit.")
+        parser.add_argument('--verify', action='store_true',
+                            help="Only check the backup, re-hashing every media file, and exit.")
+        parser.add_argument('--prune-media', action='store_true',
+                            help="Also delete media files that aren't in the backup.")
+        parser.add_argument('--jobs', type=int, help="Parallel pg_restore jobs (default: one per CPU).")
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help="Don't ask for confirmation.")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name in list_snapshots():
+                self.stdout.write(name)
+            return
+
+        try:
+            name = options['snapshot'] or find_snapshot(_point_in_time(options['at']) if options['at'] else None)
+            if name not in list_snapshots():
+                raise CommandError(f"No backup named {name}.")
+
+            if options['verify']:
+                problems = verify_snapshot(name, rehash_media=True)
+                if problems:
+                    raise CommandError(' '.join(problems))
+                self.stdout.write(self.style.SUCCESS(f"Backup {name} is sound."))
+                return
+
+            if options['interactive']:
+                answer = input(f"This replaces every site database and the media files with backup {name}.\n"
+                               "Type 'yes' to continue, or 'no' to cancel: ")
+                if answer != 'yes':
+                    self.stdout.write("Restore cancelled.")
+                    return
+
+            started = time.perf_counter()
+            written, deleted = restore_snapshot(name, prune_media=options['prune_media'], jobs=options['jobs'])
+        except BackupError as error:
+            raise CommandError(error)
+
+        self.stdout.write(f"{written} media files restored, {deleted} deleted.")
+        self.stdout.write(self.style.SUCCESS(f"Restored backup {name} in {time.perf_counter() - started:.1f}s."))
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from inventory.overdue import notify_overdue_repairs
+from inventory.routers import active_site
+
+
+class Command(BaseCommand):
+    help = "Write history alerts for active repairs past their expected return date."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep running and scan again every --interval seconds.")
+        parser.add_argument('--interval', type=int, default=3600, help="Seconds between scans with --loop.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--site', action='append', choices=list(settings.INVENTORY_SITES),
+                            help="Only scan this site (repeat for several); all sites by default.")
+
+    def handle(self, *args, **options):
+        sites = options['site'] or list(settings.INVENTORY_SITES)
+        while True:
+            for site in sites:
+                with active_site(site):
+                    notified = notify_overdue_repairs(batch_size=options['batch_size'])
+                suffix = f" for {site}" if len(settings.INVENTORY_SITES) > 1 else ""
+                self.stdout.write(f"{notified} overdue repair alert{'s' if notified != 1 else ''} written{suffix}.")
+            if not options['loop']:
+                break
+            # Don't hold connections open (or reuse dropped ones) between scans
+            connections.close_all()
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                break
@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory.sqlite import production_pragmas
+
+SCHEMA = [
+    "CREATE TABLE item (id INTEGER PRIMARY KEY, item_id TEXT UNIQUE, description TEXT, last_updated REAL)",
+    "CREATE TABLE log (id INTEGER PRIMARY KEY, item_id_str TEXT, details TEXT, timestamp REAL)",
+]
+
+
+def _run_worker(args):
+    """
+    One simulated gunicorn worker. Writers do what edit_item does (read the
+    row, update it, add a history entry); readers page through the list.
+    """
+    path, profile, role, operations, item_count, seed = args
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+    if profile == 'production':
+        for statement in production_pragmas():
+            connection.execute(statement)
+    begin = "BEGIN IMMEDIATE" if profile == 'production' else "BEGIN"
+
+    completed = locked = 0
+    started = time.perf_counter()
+    for n in range(operations):
+        pk = (seed * 7919 + n) % item_count + 1
+        try:
+            if role == 'writer':
+                connection.execute(begin)
+                connection.execute("SELECT * FROM item WHERE id = ?", (pk,)).fetchone()
+                connection.execute("UPDATE item SET description = ?, last_updated = ? WHERE id = ?",
+                                   (f"edit {seed}-{n}", time.time(), pk))
+                connection.execute("INSERT INTO log (item_id_str, details, timestamp) VALUES (?, ?, ?)",
+                                   (f"ITEM-{pk}", "Description changed", time.time()))
+                connection.execute("COMMIT")
+            else:
+                connection.execute("SELECT * FROM item ORDER BY item_id LIMIT 200 OFFSET ?",
+                                   (pk % max(item_count - 200, 1),)).fetchall()
+            completed += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error) and 'busy' not in str(error):
+                raise
+            locked += 1
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+    elapsed = time.perf_counter() - started
+    connection.close()
+    return role, completed, locked, elapsed
+
+
+class Command(BaseCommand):
+    help = "Compare concurrent edits against SQLite with the default settings and the production profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help="Concurrent writer processes.")
+        parser.add_argument('--readers', type=int, default=4, help="Concurrent reader processes.")
+        parser.add_argument('--operations', type=int, default=500, help="Operations per process.")
+        parser.add_argument('--items', type=int, default=5000, help="Rows in the benchmark table.")
+
+    def handle(self, *args, **options):
+        for profile in ['default', 'production']:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self._create_database(path, options['items'])
+                results = self._run(path, profile, options)
+            self._report(profile, results)
+
+    def _create_database(self, path, item_count):
+        connection = sqlite3.connect(path)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.executemany(
+            "INSERT INTO item (item_id, description, last_updated) VALUES (?, ?, ?)",
+            ((f"ITEM-{n:06d}", "Benchmark item", time.time()) for n in range(item_count))
+        )
+        connection.commit()
+        connection.close()
+
+    def _run(self, path, profile, options):
+        jobs = [(path, profile, 'writer', options['operations'], options['items'], seed)
+                for seed in range(options['writers'])]
+        jobs += [(path, profile, 'reader', options['operations'], options['items'], seed)
+                 for seed in range(options['readers'])]
+
+        started = time.perf_counter()
+        with multiprocessing.Pool(len(jobs)) as pool:
+            results = pool.map(_run_worker, jobs)
+        return results, time.perf_counter() - started
+
+    def _report(self, profile, run):
+        results, wall_time = run
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Profile: {profile}"))
+        for role in ['writer', 'reader']:
+            completed = sum(r[1] for r in results if r[0] == role)
+            locked = sum(r[2] for r in results if r[0] == role)
+            self.stdout.write(
+                f"  {role}s: {completed} ok, {locked} 'database is locked', "
+                f"{completed / wall_time:.0f} ops/s"
+            )
+        self.stdout.write(f"  wall time: {wall_time:.2f}s")
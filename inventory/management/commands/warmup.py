@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory.warmup import format_timings, warm_up
+
+
+class Command(BaseCommand):
+    help = ("Resolve URLs, compile templates, prime the caches and open the database connections, "
+            "and report how long each step took. gunicorn.conf.py does the first two before forking workers "
+            "and the other two in each worker.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-reports', action='store_true',
+                            help="Don't build the repair analytics reports, the slowest step on large databases.")
+
+    def handle(self, *args, **options):
+        for line in format_timings(warm_up(reports=not options['skip_reports'])):
+            self.stdout.write(line)
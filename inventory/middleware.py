@@ -0,0 +1,69 @@
+from django.conf import settings
+
+from . import routers
+
+# Cookie that keeps a client reading from the primary right after it wrote
+PIN_PRIMARY_COOKIE = 'inventory_pin_primary'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Feed the current view name and the client's stickiness to ReplicaRouter.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.begin_request(pinned=PIN_PRIMARY_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request()
+
+        if wrote and getattr(settings, 'DATABASE_REPLICAS', []):
+            response.set_cookie(
+                PIN_PRIMARY_COOKIE, '1',
+                max_age=settings.REPLICA_LAG_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routers.set_view(request.resolver_match.url_name)
+        return None
+
+
+# Session key remembering the warehouse site a user is working in
+SITE_SESSION_KEY = 'inventory_site'
+
+
+class SiteMiddleware:
+    """
+    Route the request's inventory queries to the user's warehouse site.
+    ?site=<name> on any page switches site; the choice is kept in the session.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sites = settings.INVENTORY_SITES
+        site = settings.INVENTORY_DEFAULT_SITE
+        # With a single site there is nothing to choose, so don't load the session for it
+        if len(sites) > 1:
+            requested = request.GET.get('site')
+            if requested in sites:
+                request.session[SITE_SESSION_KEY] = requested
+            site = request.session.get(SITE_SESSION_KEY, site)
+            if site not in sites:
+                site = settings.INVENTORY_DEFAULT_SITE
+        request.site = site
+        request.sites = list(sites)
+
+        routers.set_site(site)
+        try:
+            return self.get_response(request)
+        finally:
+            routers.set_site(None)
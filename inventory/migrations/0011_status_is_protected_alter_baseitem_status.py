@@ -0,0 +1,106 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Status',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('is_protected', models.BooleanField(default=False, help_text='Protected statuses cannot be deleted by users.')),
+            ],
+            options={
+                'verbose_name_plural': 'Statuses',
+            },
+        ),
+        migrations.AddField(
+            model_name='baseitem',
+            name='datasheet',
+            field=models.FileField(blank=True, null=True, upload_to='item_documents/', verbose_name='Datasheet'),
+        ),
+        migrations.AddField(
+            model_name='baseitem',
+            name='document1',
+            field=models.FileField(blank=True, null=True, upload_to='item_documents/', verbose_name='Document 1'),
+        ),
+        migrations.AddField(
+            model_name='baseitem',
+            name='document2',
+            field=models.FileField(blank=True, null=True, upload_to='item_documents/', verbose_name='Document 2'),
+        ),
+        migrations.AddField(
+            model_name='baseitem',
+            name='document3',
+            field=models.FileField(blank=True, null=True, upload_to='item_documents/', verbose_name='Document 3'),
+        ),
+        migrations.AddField(
+            model_name='baseitem',
+            name='document4',
+            field=models.FileField(blank=True, null=True, upload_to='item_documents/', verbose_name='Document 4'),
+        ),
+        migrations.AddField(
+            model_name='baseitem',
+            name='document5',
+            field=models.FileField(blank=True, null=True, upload_to='item_documents/', verbose_name='Document 5'),
+        ),
+        migrations.AddField(
+            model_name='baseitem',
+            name='manual',
+            field=models.FileField(blank=True, null=True, upload_to='item_documents/', verbose_name='Manual'),
+        ),
+        migrations.CreateModel(
+            name='LogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('action', models.CharField(max_length=50)),
+                ('item_id_str', models.CharField(max_length=100, verbose_name='Item ID')),
+                ('details', models.TextField(blank=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_log_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RepairLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('repair_company', models.CharField(max_length=200)),
+                ('contact_name', models.CharField(blank=True, max_length=200)),
+                ('contact_number', models.CharField(blank=True, max_length=50)),
+                ('contact_email', models.EmailField(blank=True, max_length=254)),
+                ('start_date', models.DateField()),
+                ('expected_return_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='Repair End Date')),
+                ('description', models.TextField()),
+                ('cost', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Estimated/Final Cost')),
+                ('document1', models.FileField(blank=True, null=True, upload_to='repair_documents/', verbose_name='Document 1')),
+                ('document2', models.FileField(blank=True, null=True, upload_to='repair_documents/', verbose_name='Document 2')),
+                ('document3', models.FileField(blank=True, null=True, upload_to='repair_documents/', verbose_name='Document 3')),
+                ('document4', models.FileField(blank=True, null=True, upload_to='repair_documents/', verbose_name='Document 4')),
+                ('document5', models.FileField(blank=True, null=True, upload_to='repair_documents/', verbose_name='Document 5')),
+                ('is_active', models.BooleanField(default=True, help_text='Is the repair currently ongoing?')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='repairs', to='inventory.baseitem')),
+            ],
+            options={
+                'ordering': ['-start_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='baseitem',
+            name='status',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.status'),
+        ),
+    ]
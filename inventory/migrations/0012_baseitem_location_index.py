@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_status_is_protected_alter_baseitem_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='baseitem',
+            name='location',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+    ]
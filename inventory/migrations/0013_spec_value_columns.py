@@ -0,0 +1,93 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_baseitem_location_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mixtank',
+            name='inlet_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='mixtank',
+            name='inlet_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in in.', null=True),
+        ),
+        migrations.AddField(
+            model_name='mixtank',
+            name='outlet_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='mixtank',
+            name='outlet_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in in.', null=True),
+        ),
+        migrations.AddField(
+            model_name='mixtank',
+            name='power_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='mixtank',
+            name='power_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in hp.', null=True),
+        ),
+        migrations.AddField(
+            model_name='pump',
+            name='inlet_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='pump',
+            name='inlet_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in in.', null=True),
+        ),
+        migrations.AddField(
+            model_name='pump',
+            name='outlet_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='pump',
+            name='outlet_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in in.', null=True),
+        ),
+        migrations.AddField(
+            model_name='pump',
+            name='power_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='pump',
+            name='power_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in hp.', null=True),
+        ),
+        migrations.AddField(
+            model_name='pump',
+            name='speed_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='pump',
+            name='speed_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in rpm.', null=True),
+        ),
+        migrations.AddField(
+            model_name='valve',
+            name='size_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='valve',
+            name='size_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in in.', null=True),
+        ),
+    ]
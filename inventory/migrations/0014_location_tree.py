@@ -0,0 +1,84 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:10
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+KINDS = ['site', 'building', 'aisle', 'bin']
+
+
+def split_location(text):
+    """
+    'Building 2 / Aisle 3', 'Building 2 > Aisle 3' and 'building 2, aisle 3'
+    all become ['Building 2', 'Aisle 3'] style parts.
+    """
+    parts = re.split(r'\s*[/>,|]\s*', text.strip())
+    return [' '.join(part.split()) for part in parts if part.strip()]
+
+
+def map_locations(apps, schema_editor):
+    """
+    Build the location tree from the existing free-text locations. Parts are
+    matched case-insensitively under the same parent, so 'building 2' and
+    'Building 2' end up as one node.
+    """
+    Location = apps.get_model('inventory', 'Location')
+    BaseItem = apps.get_model('inventory', 'BaseItem')
+    nodes = {}
+
+    def get_node(parent, name, depth):
+        key = (parent.pk if parent else None, name.lower())
+        if key not in nodes:
+            node = Location.objects.create(
+                name=name,
+                kind=KINDS[min(depth, len(KINDS) - 1)],
+                parent=parent,
+                full_name=f"{parent.full_name} / {name}" if parent else name,
+            )
+            node.path = f"{parent.path if parent else ''}{node.pk:06d}/"
+            node.save(update_fields=['path'])
+            nodes[key] = node
+        return nodes[key]
+
+    texts = BaseItem.objects.exclude(location='').values_list('location', flat=True).distinct()
+    for text in texts:
+        node = None
+        for depth, name in enumerate(split_location(text)):
+            node = get_node(node, name[:100], depth)
+        if node:
+            BaseItem.objects.filter(location=text).update(location_node=node)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_spec_value_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('site', 'Site'), ('building', 'Building'), ('aisle', 'Aisle'), ('bin', 'Bin')], max_length=20)),
+                ('path', models.CharField(editable=False, max_length=255, null=True, unique=True)),
+                ('full_name', models.CharField(editable=False, max_length=255)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='inventory.location')),
+            ],
+            options={
+                'ordering': ['path'],
+            },
+        ),
+        migrations.AddField(
+            model_name='baseitem',
+            name='location_node',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='items', to='inventory.location', verbose_name='Storage location'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(fields=('parent', 'name'), name='unique_location_name_per_parent'),
+        ),
+        migrations.RunPython(map_locations, migrations.RunPython.noop),
+    ]
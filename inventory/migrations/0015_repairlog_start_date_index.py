@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_location_tree'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='repairlog',
+            name='start_date',
+            field=models.DateField(db_index=True),
+        ),
+    ]
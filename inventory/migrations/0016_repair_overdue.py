@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_repairlog_start_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repairlog',
+            name='overdue_notified_on',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='repairlog',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expected_return_date'], name='repair_overdue_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_repair_overdue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baseitem',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='repairlog',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
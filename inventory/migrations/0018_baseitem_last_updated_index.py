@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_version_columns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='baseitem',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
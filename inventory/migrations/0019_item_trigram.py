@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:27
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A copy of inventory.duplicates as it was when this migration was written,
+# so later changes there can't change what the migration does
+TRIGRAM_FIELDS = ['item_id', 'description', 'vendor']
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+
+def trigrams(text):
+    grams = set()
+    for word in WORD_PATTERN.findall((text or '').lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def item_trigrams(item):
+    return trigrams(' '.join(getattr(item, field) or '' for field in TRIGRAM_FIELDS))
+
+
+def index_existing_items(apps, schema_editor):
+    BaseItem = apps.get_model('inventory', 'BaseItem')
+    ItemTrigram = apps.get_model('inventory', 'ItemTrigram')
+    last_pk = 0
+    while True:
+        batch = list(BaseItem.objects.filter(pk__gt=last_pk).order_by('pk').only(*TRIGRAM_FIELDS)[:1000])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        ItemTrigram.objects.bulk_create(
+            [ItemTrigram(gram=gram, item_id=item.pk) for item in batch for gram in item_trigrams(item)],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_baseitem_last_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='inventory.baseitem')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('gram', 'item'), name='unique_item_trigram')],
+            },
+        ),
+        migrations.RunPython(index_existing_items, migrations.RunPython.noop),
+    ]
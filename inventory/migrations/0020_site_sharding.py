@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:42
+
+import django.db.models.deletion
+import inventory.routers
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_row_sites(apps, schema_editor):
+    """
+    Existing rows belong to the site whose database is being migrated.
+    """
+    db = schema_editor.connection.alias
+    site = inventory.routers.site_for_database(db)
+    if site is None:
+        return
+    for model_name in ['BaseItem', 'LogEntry', 'RepairLog']:
+        apps.get_model('inventory', model_name).objects.using(db).update(site=site)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0019_item_trigram'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baseitem',
+            name='site',
+            field=models.CharField(default=inventory.routers.current_site, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='logentry',
+            name='site',
+            field=models.CharField(default=inventory.routers.current_site, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='repairlog',
+            name='site',
+            field=models.CharField(default=inventory.routers.current_site, editable=False, max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='logentry',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_log_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(set_row_sites, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0020_site_sharding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filter',
+            name='inlet_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='filter',
+            name='inlet_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in in.', null=True),
+        ),
+        migrations.AddField(
+            model_name='filter',
+            name='outlet_unit',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='filter',
+            name='outlet_value',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Parsed value in in.', null=True),
+        ),
+    ]
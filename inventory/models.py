@@ -1,5 +1,37 @@
+import re
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.functions import Left
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .routers import current_site
+
+
+def site_field():
+    # The warehouse site a row belongs to. Each site's rows are kept in that
+    # site's database (see ShardRouter), so within one database this is
+    # constant; it tells rows apart once several sites' results are merged.
+    return models.CharField(max_length=50, default=current_site, editable=False)
+
+
+def split_location(text):
+    """
+    'Building 2 / Aisle 3', 'Building 2 > Aisle 3' and 'building 2, aisle 3'
+    all become ['Building 2', 'Aisle 3'] style parts.
+    """
+    parts = re.split(r'\s*[/>,|]\s*', text.strip())
+    return [' '.join(part.split()) for part in parts if part.strip()]
+
+
+def item_url(view_name, pk, site):
+    """
+    The URL of one of an item's pages. It names the item's site, so the link
+    works from any site's pages, exports and printed labels.
+    """
+    return f"{reverse(view_name, args=[pk])}?{urlencode({'site': site})}"
+
 
 class Status(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -11,7 +43,170 @@ class Status(models.Model):
     class Meta:
         verbose_name_plural = "Statuses"
 
-class BaseItem(models.Model):
+class Location(models.Model):
+    """
+    A node in the site > building > aisle > bin tree.
+
+    `path` is the materialized path of primary keys from the root, e.g.
+    "000001/000004/000017/". Everything under a node shares its path as a
+    prefix, so a whole subtree is one range scan on the path index.
+    """
+    KIND_CHOICES = [
+        ("site", "Site"),
+        ("building", "Building"),
+        ("aisle", "Aisle"),
+        ("bin", "Bin"),
+    ]
+    # Width of one "000123/" step in the path: the zero-padded primary key and a slash
+    PATH_STEP = 7
+
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    parent = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='children')
+    path = models.CharField(max_length=255, unique=True, null=True, editable=False)
+    full_name = models.CharField(max_length=255, editable=False)
+
+    def __str__(self):
+        return self.full_name
+
+    class Meta:
+        ordering = ['path']
+        constraints = [
+            models.UniqueConstraint(fields=['parent', 'name'], name='unique_location_name_per_parent'),
+        ]
+
+    @property
+    def depth(self):
+        return len(self.path) // self.PATH_STEP - 1
+
+    def ancestor_ids(self):
+        steps = self.path.rstrip('/').split('/')
+        return [int(step) for step in steps[:-1]]
+
+    def subtree_q(self, field='path'):
+        """
+        Q matching this node and everything below it: path <= value < path + '~'.
+        '~' sorts after the digits and '/' that paths are made of.
+        """
+        return models.Q(**{f'{field}__gte': self.path, f'{field}__lt': self.path + '~'})
+
+    @classmethod
+    def for_text(cls, text):
+        """
+        The node for a free-text location such as 'Building 2 / Aisle 3',
+        creating it and any missing ancestors. Parts match existing nodes
+        case-insensitively under the same parent. None for blank text.
+
+        A new node's kind is the one its name starts with ('Bin 7' is a bin),
+        otherwise the kind usual at its depth.
+        """
+        kinds = [kind for kind, label in cls.KIND_CHOICES]
+        labels = {label.lower(): kind for kind, label in cls.KIND_CHOICES}
+        node = None
+        for depth, name in enumerate(split_location(text)):
+            name = name[:cls._meta.get_field('name').max_length]
+            parent = node
+            node = cls.objects.filter(parent=parent, name__iexact=name).first()
+            if node is None:
+                kind = labels.get(name.split()[0].lower(), kinds[min(depth, len(kinds) - 1)])
+                node = cls.objects.create(name=name, kind=kind, parent=parent)
+        return node
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        old_path, old_name = self.path, self.full_name
+        self._set_path()
+        if (self.path, self.full_name) != (old_path, old_name):
+            Location.objects.filter(pk=self.pk).update(path=self.path, full_name=self.full_name)
+            if old_path:
+                self._rebuild_descendants(old_path)
+
+    def _set_path(self):
+        parent_path = self.parent.path if self.parent else ''
+        step = f"{self.pk:0{self.PATH_STEP - 1}d}/"
+        # A wider step would break the path order and depth
+        if len(step) != self.PATH_STEP:
+            raise ValueError(f"Location {self.pk} doesn't fit a {self.PATH_STEP}-character path step.")
+        self.path = f"{parent_path}{step}"
+        self.full_name = f"{self.parent.full_name} / {self.name}" if self.parent else self.name
+
+    def _rebuild_descendants(self, old_path):
+        # A rename or move changes every path and full name below this node.
+        # Walking in path order means each parent is fixed before its children.
+        nodes = {self.pk: self}
+        descendants = list(Location.objects.filter(path__gt=old_path, path__lt=old_path + '~').order_by('path'))
+        for node in descendants:
+            node.parent = nodes[node.parent_id]
+            node._set_path()
+            nodes[node.pk] = node
+        Location.objects.bulk_update(descendants, ['path', 'full_name'])
+        # Keep the items' free-text location (used by search and typeahead) in
+        # step, as a change to the items: edit forms loaded before it conflict
+        full_name = Location.objects.filter(pk=models.OuterRef('location_node')).values('full_name')
+        BaseItem.objects.filter(location_node__in=[self, *descendants]).update(
+            location=Left(models.Subquery(full_name), BaseItem._meta.get_field('location').max_length),
+            version=models.F('version') + 1,
+        )
+
+
+class ConcurrentUpdateError(Exception):
+    """
+    Raised when saving a versioned object whose row was changed by someone
+    else after the object was loaded.
+    """
+
+    def __init__(self, instance):
+        self.instance = instance
+        super().__init__(f"{instance._meta.verbose_name} {instance.pk} was changed by someone else.")
+
+
+class VersionedModel(models.Model):
+    """
+    Optimistic concurrency control. Every save bumps `version`, and the UPDATE
+    only matches the row while it still has the version this object was loaded
+    with, so a stale save raises ConcurrentUpdateError instead of overwriting
+    newer changes. No row lock is held between loading and saving.
+
+    Queryset .update() calls bypass this and must bump the version themselves
+    with F('version') + 1.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        self._expected_version = self.version
+        self.version += 1
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self.version = self._expected_version
+            raise
+        finally:
+            del self._expected_version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # With multi-table inheritance this runs once per table; only the one
+        # holding the version column is checked
+        expected = getattr(self, '_expected_version', None)
+        if expected is None or self._meta.get_field('version') not in base_qs.model._meta.local_concrete_fields:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+        if super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update):
+            return True
+        if base_qs.filter(pk=pk_val).exists():
+            raise ConcurrentUpdateError(self)
+        # The row is gone; let save() fall back to an INSERT as usual
+        return False
+
+
+class BaseItem(VersionedModel):
     # List of category fields
     CATEGORY_CHOICES = [
         ("Pump", "Pump"),
@@ -27,7 +222,9 @@ class BaseItem(models.Model):
     description = models.TextField(blank=True)
     vendor = models.CharField(max_length=100, blank=True)
     rating = models.CharField(max_length=50, blank=True)
-    location = models.CharField(max_length=100, blank=True)
+    location = models.CharField(max_length=100, blank=True, db_index=True)  # Indexed for typeahead prefix lookups
+    location_node = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='items', verbose_name="Storage location")
     status = models.ForeignKey(Status, on_delete=models.SET_NULL, null=True, blank=True)
     datasheet = models.FileField(upload_to='item_documents/', blank=True, null=True, verbose_name="Datasheet")
     manual = models.FileField(upload_to='item_documents/', blank=True, null=True, verbose_name="Manual")
@@ -36,15 +233,32 @@ class BaseItem(models.Model):
     document3 = models.FileField(upload_to='item_documents/', blank=True, null=True, verbose_name="Document 3")
     document4 = models.FileField(upload_to='item_documents/', blank=True, null=True, verbose_name="Document 4")
     document5 = models.FileField(upload_to='item_documents/', blank=True, null=True, verbose_name="Document 5")
-    last_updated = models.DateTimeField(auto_now=True)
+    last_updated = models.DateTimeField(auto_now=True, db_index=True)
+    site = site_field()
 
     def __str__(self):
         return f"{self.item_id} ({self.get_category_display()})"
 
+    def get_absolute_url(self):
+        return item_url('item_detail', self.pk, self.site)
+
     class Meta:
         ordering = ['item_id']  # Orders items by the Item_ID
 
 
+# Numeric copies of free-text spec fields, kept in sync on save (see units.py).
+# The value is normalized to the canonical unit of its quantity so it can be
+# range-filtered through an index; the unit column keeps the unit as entered.
+
+def spec_value_field(canonical_unit):
+    return models.FloatField(null=True, blank=True, editable=False, db_index=True,
+                             help_text=f"Parsed value in {canonical_unit}.")
+
+
+def spec_unit_field():
+    return models.CharField(max_length=20, blank=True, editable=False)
+
+
 # The models inherit all fields from BaseItem and add their own specific attributes
 
 class Pump(BaseItem):
@@ -54,12 +268,27 @@ class Pump(BaseItem):
     moc = models.CharField(max_length=100, blank=True, verbose_name="Material of Construction")
     power = models.CharField(max_length=50, blank=True)
 
+    # Free-text field -> quantity it holds
+    SPEC_FIELDS = {'power': 'power', 'speed': 'speed', 'inlet': 'size', 'outlet': 'size'}
+    power_value = spec_value_field('hp')
+    power_unit = spec_unit_field()
+    speed_value = spec_value_field('rpm')
+    speed_unit = spec_unit_field()
+    inlet_value = spec_value_field('in')
+    inlet_unit = spec_unit_field()
+    outlet_value = spec_value_field('in')
+    outlet_unit = spec_unit_field()
+
 
 class Valve(BaseItem):
     moc = models.CharField(max_length=100, blank=True, verbose_name="Material of Construction")
     size = models.CharField(max_length=50, blank=True)
     valve_type = models.CharField(max_length=100, blank=True, verbose_name="Valve Type")
 
+    SPEC_FIELDS = {'size': 'size'}
+    size_value = spec_value_field('in')
+    size_unit = spec_unit_field()
+
 
 class Filter(BaseItem):
     inlet = models.CharField(max_length=50, blank=True)
@@ -67,6 +296,12 @@ class Filter(BaseItem):
     moc = models.CharField(max_length=100, blank=True, verbose_name="Material of Construction")
     filter_type = models.CharField(max_length=100, blank=True, verbose_name="Filter Type")
 
+    SPEC_FIELDS = {'inlet': 'size', 'outlet': 'size'}
+    inlet_value = spec_value_field('in')
+    inlet_unit = spec_unit_field()
+    outlet_value = spec_value_field('in')
+    outlet_unit = spec_unit_field()
+
 
 class MixTank(BaseItem):
     inlet = models.CharField(max_length=50, blank=True)
@@ -74,6 +309,14 @@ class MixTank(BaseItem):
     moc = models.CharField(max_length=100, blank=True, verbose_name="Material of Construction")
     power = models.CharField(max_length=50, blank=True)
 
+    SPEC_FIELDS = {'power': 'power', 'inlet': 'size', 'outlet': 'size'}
+    power_value = spec_value_field('hp')
+    power_unit = spec_unit_field()
+    inlet_value = spec_value_field('in')
+    inlet_unit = spec_unit_field()
+    outlet_value = spec_value_field('in')
+    outlet_unit = spec_unit_field()
+
 
 class CommandCenter(BaseItem):
     # This item has no extra fields beyond the base ones
@@ -88,12 +331,31 @@ class Misc(BaseItem):
     power = models.CharField(max_length=50, blank=True)
     quantity = models.CharField(max_length=50, blank=True)
 
+class ItemTrigram(models.Model):
+    """
+    Inverted index of the three-letter sequences in each item's ID,
+    description and vendor (see duplicates.py). Looking up the trigrams of a
+    new item finds the items sharing the most of them through the gram index,
+    without comparing against every row.
+    """
+    gram = models.CharField(max_length=3)
+    item = models.ForeignKey(BaseItem, on_delete=models.CASCADE, related_name='trigrams')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['gram', 'item'], name='unique_item_trigram'),
+        ]
+
+
 class LogEntry(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_log_entries')
+    # Users are kept in the default database, so a site's database can't enforce this key
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False,
+                             related_name='inventory_log_entries')
     action = models.CharField(max_length=50)
     item_id_str = models.CharField(max_length=100, verbose_name="Item ID")
     details = models.TextField(blank=True)
+    site = site_field()
 
     def __str__(self):
         return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} - {self.action} - {self.item_id_str}"
@@ -102,7 +364,7 @@ class LogEntry(models.Model):
         ordering = ['-timestamp']  # Show the most recent logs first
 
 
-class RepairLog(models.Model):
+class RepairLog(VersionedModel):
     item = models.ForeignKey(BaseItem, on_delete=models.CASCADE, related_name='repairs')
 
     # Repair Detail Fields
@@ -110,7 +372,7 @@ class RepairLog(models.Model):
     contact_name = models.CharField(max_length=200, blank=True)
     contact_number = models.CharField(max_length=50, blank=True)
     contact_email = models.EmailField(max_length=254, blank=True)
-    start_date = models.DateField()
+    start_date = models.DateField(db_index=True)
     expected_return_date = models.DateField(null=True, blank=True)
     end_date = models.DateField(null=True, blank=True, verbose_name="Repair End Date")
     description = models.TextField()
@@ -124,10 +386,19 @@ class RepairLog(models.Model):
 
     # Status of the repair itself
     is_active = models.BooleanField(default=True, help_text="Is the repair currently ongoing?")
+    # Set by scan_overdue_repairs when it raises the overdue alert
+    overdue_notified_on = models.DateField(null=True, blank=True, editable=False)
+    site = site_field()
 
     def __str__(self):
         status = "Active" if self.is_active else "Complete"
         return f"Repair for {self.item.item_id} ({status})"
 
     class Meta:
-        ordering = ['-start_date']
\ No newline at end of file
+        ordering = ['-start_date']
+        indexes = [
+            # Only active repairs can be overdue, so the index leaves out the
+            # (much larger) history of completed ones
+            models.Index(fields=['expected_return_date'], condition=models.Q(is_active=True),
+                         name='repair_overdue_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import LogEntry, RepairLog
+
+OVERDUE_ACTION = "Repair Overdue"
+
+
+def overdue_repairs(today=None):
+    """
+    Active repairs past their expected return date, oldest first. The filter
+    and ordering match repair_overdue_idx, so this is an index range scan.
+    """
+    today = today or timezone.localdate()
+    return RepairLog.objects.filter(is_active=True, expected_return_date__lt=today).order_by('expected_return_date')
+
+
+def notify_overdue_repairs(today=None, batch_size=500):
+    """
+    Write a "Repair Overdue" history entry for every overdue repair that
+    hasn't been alerted yet, `batch_size` repairs per transaction. Return the
+    number of alerts written.
+
+    A repair is alerted again if its expected return date was moved past the
+    last alert and it is overdue once more.
+    """
+    today = today or timezone.localdate()
+    pending = overdue_repairs(today).filter(
+        Q(overdue_notified_on__isnull=True) | Q(overdue_notified_on__lte=F('expected_return_date'))
+    )
+
+    notified = 0
+    while True:
+        with transaction.atomic():
+            # Alerted repairs drop out of `pending`, so every pass takes the next batch
+            batch = list(pending.select_related('item').select_for_update()[:batch_size])
+            if not batch:
+                break
+            LogEntry.objects.bulk_create([
+                LogEntry(
+                    action=OVERDUE_ACTION,
+                    item_id_str=repair.item.item_id,
+                    details=f"Repair by {repair.repair_company} was expected back on "
+                            f"{repair.expected_return_date:%Y-%m-%d} "
+                            f"({(today - repair.expected_return_date).days} days overdue).",
+                )
+                for repair in batch
+            ])
+            RepairLog.objects.filter(pk__in=[repair.pk for repair in batch]).update(
+                overdue_notified_on=today, version=F('version') + 1
+            )
+        notified += len(batch)
+    return notified
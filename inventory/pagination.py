@@ -0,0 +1,54 @@
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+# Below this many rows an exact COUNT(*) is cheap enough to run
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+def estimated_row_count(model, using='default'):
+    """
+    The planner's row estimate for the model's table, or None if the database
+    has none. Postgres keeps it in pg_class.reltuples (refreshed by
+    autovacuum / ANALYZE); SQLite only has it in sqlite_stat1 after ANALYZE
+    or PRAGMA optimize.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+                row = cursor.fetchone()
+                estimate = row[0] if row else None
+            elif connection.vendor == 'sqlite':
+                # Each stat row starts with the number of rows in that index;
+                # partial indexes hold fewer, so take the largest
+                cursor.execute("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s", [table])
+                estimate = cursor.fetchone()[0]
+            else:
+                return None
+    except DatabaseError:
+        # No sqlite_stat1 table until ANALYZE has run
+        return None
+    # reltuples is -1 for a table that has never been analyzed
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists on large tables. An unfiltered list takes
+    its count from the database's statistics instead of a COUNT(*) over the
+    whole table, once the estimate is above `estimate_threshold`. Filtered
+    lists and small tables still get an exact count.
+    """
+    estimate_threshold = ESTIMATED_COUNT_THRESHOLD
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.estimate_threshold:
+                return estimate
+        return super().count
@@ -0,0 +1,15 @@
+def query_budget(max_queries):
+    """
+    Declare the most queries a view may run for one request, no matter how
+    many rows it shows. Used in urls.py and enforced by QueryBudgetTest.
+
+        path('', query_budget(4)(views.item_list), name='item_list')
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def get_query_budget(view_func):
+    return getattr(view_func, 'query_budget', None)
@@ -0,0 +1,25 @@
+from django.core.cache import cache
+
+from .models import Status
+from .routers import current_site, site_for_database
+
+# The status list, per site, as shown on every item list page
+STATUSES_CACHE_KEY = 'statuses:{site}'
+# Status changes clear the cache in the process that made them; with a
+# per-process cache the other workers catch up after this many seconds
+STATUSES_TIMEOUT = 300
+
+
+def get_statuses():
+    """
+    The current site's statuses ordered by name, from the cache when possible.
+    """
+    key = STATUSES_CACHE_KEY.format(site=current_site())
+    return cache.get_or_set(key, lambda: list(Status.objects.order_by('name')), STATUSES_TIMEOUT)
+
+
+def invalidate_statuses(sender=None, using=None, **kwargs):
+    """
+    Connected to Status post_save / post_delete.
+    """
+    cache.delete(STATUSES_CACHE_KEY.format(site=site_for_database(using) or current_site()))
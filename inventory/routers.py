@@ -0,0 +1,184 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Views whose reads can safely be served by a replica. Exports go through
+# item_list (?format=print) so they are covered by the same entry.
+REPLICA_READ_VIEWS = {'item_list', 'item_detail', 'log_history', 'item_typeahead'}
+
+# Apps whose tables are split by warehouse site; the rest live in 'default'
+SHARDED_APPS = {'inventory'}
+
+_state = threading.local()
+
+
+def begin_request(pinned=False):
+    """
+    Reset the routing state at the start of a request. `pinned` is True when
+    the client wrote recently and the replicas may not have caught up yet.
+    """
+    _state.view_name = None
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def set_view(view_name):
+    _state.view_name = view_name
+
+
+def end_request():
+    """
+    Return True if the request wrote to the primary, then clear the state.
+    """
+    wrote = getattr(_state, 'wrote', False)
+    _state.view_name = None
+    _state.pinned = False
+    _state.wrote = False
+    return wrote
+
+
+def set_site(site):
+    _state.site = site
+
+
+def current_site():
+    """
+    The warehouse site queries are routed to: the one chosen for the request
+    or by active_site(), otherwise the default site.
+    """
+    return getattr(_state, 'site', None) or settings.INVENTORY_DEFAULT_SITE
+
+
+@contextmanager
+def active_site(site):
+    """
+    Route queries to `site` inside the block, e.g. in management commands.
+    """
+    previous = getattr(_state, 'site', None)
+    _state.site = site
+    try:
+        yield
+    finally:
+        _state.site = previous
+
+
+def begin_migration(sender=None, using=None, **kwargs):
+    """
+    pre_migrate: route the data migrations' queries to the database being
+    migrated, whichever site it belongs to.
+    """
+    _state.migrating = using
+
+
+def end_migration(sender=None, **kwargs):
+    _state.migrating = None
+
+
+def site_database(site):
+    return settings.INVENTORY_SITES[site]
+
+
+def site_for_database(db):
+    """
+    The site whose inventory is kept in database `db`, or None.
+    """
+    for site, alias in settings.INVENTORY_SITES.items():
+        if alias == db:
+            return site
+    return None
+
+
+def is_site_database(db):
+    """
+    True for a database holding only a site's inventory, which can't be joined
+    to the shared tables in 'default'.
+    """
+    return db != 'default' and db in settings.INVENTORY_SITES.values()
+
+
+class ShardRouter:
+    """
+    Keep each warehouse site's items, repairs and history in that site's
+    database (settings.INVENTORY_SITES) and everything else in 'default'.
+
+    Queries go to the current site. Lookups that start from an object, such as
+    item.status or log.user, go where that object's related rows are, so
+    objects loaded from another site with .using() work as usual.
+
+    The default site is left to ReplicaRouter, so its reads can still be
+    served by the replicas. During migrate, the data migrations work on the
+    database being migrated.
+    """
+
+    def _route(self, model, hints):
+        migrating = getattr(_state, 'migrating', None)
+        if migrating is not None and model._meta.app_label in SHARDED_APPS:
+            return migrating
+        instance = hints.get('instance')
+        db = instance._state.db if instance is not None else None
+        if model._meta.app_label in SHARDED_APPS:
+            # Lookups from inventory rows stay in their database, others use the current site's
+            if db is None or instance._meta.app_label not in SHARDED_APPS:
+                db = site_database(current_site())
+            return db if is_site_database(db) else None
+        # Shared rows referenced from a site's database, e.g. a history entry's user
+        return 'default' if is_site_database(db) else None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = [obj._meta.app_label in SHARDED_APPS for obj in (obj1, obj2)]
+        # Users are shared by every site, so any site's rows can point to them
+        if sharded[0] != sharded[1]:
+            return True
+        if is_site_database(obj1._state.db) or is_site_database(obj2._state.db):
+            return obj1._state.db == obj2._state.db
+        return None
+
+
+class ReplicaRouter:
+    """
+    Send reads from the list, detail and history views to a replica and
+    everything else to the primary ('default').
+
+    Once a request has written, the rest of that request reads from the primary
+    so it sees its own changes. The middleware also pins the client to the
+    primary for REPLICA_LAG_SECONDS afterwards to cover replication lag.
+    """
+
+    def _replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def db_for_read(self, model, **hints):
+        replicas = self._replicas()
+        if not replicas:
+            return None
+        if getattr(_state, 'pinned', False) or getattr(_state, 'wrote', False):
+            return 'default'
+        if getattr(_state, 'view_name', None) not in REPLICA_READ_VIEWS:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary, so objects loaded from
+        # either side can be related to each other.
+        databases = {'default', *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary, never from migrate
+        if db in self._replicas():
+            return False
+        return None
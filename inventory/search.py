@@ -0,0 +1,9 @@
+from django.db.models import Q
+
+
+def prefix_range(field, prefix):
+    """
+    Match values starting with `prefix` as a range (prefix <= value < prefix + U+10FFFF).
+    Unlike istartswith, this is answered from the column's B-tree index.
+    """
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\U0010ffff'})
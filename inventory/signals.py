@@ -1,4 +1,6 @@
-from .models import LogEntry
+from .duplicates import TRIGRAM_FIELDS, index_item
+from .models import Location, LogEntry
+from .units import apply_spec_values
 
 
 def store_old_instance_on_save(sender, instance, **kwargs):
@@ -12,6 +14,50 @@ def store_old_instance_on_save(sender, instance, **kwargs):
             pass
 
 
+def sync_spec_values(sender, instance, **kwargs):
+    """
+    Before an item is saved, refresh its numeric spec columns from the text fields.
+    """
+    apply_spec_values(instance)
+
+
+def sync_location_text(sender, instance, **kwargs):
+    """
+    Before an item is saved, keep its storage location and the free-text
+    location that search and the typeahead use in step. Newly typed text
+    picks (or creates) the matching location; otherwise the text is the
+    location's full name.
+
+    Text only counts as typed if it is neither the location's full name nor
+    the text already stored, so a form that still shows the name from
+    before a rename doesn't bring the old name back as a new location.
+    """
+    max_length = instance._meta.get_field('location').max_length
+    old_instance = getattr(instance, '_old_instance', None)
+    node = instance.location_node
+    node_changed = old_instance is None or old_instance.location_node_id != instance.location_node_id
+    typed = (
+        (old_instance is None or instance.location != old_instance.location)
+        and (node is None or instance.location != node.full_name[:max_length])
+    )
+    if node is None or (typed and not node_changed):
+        instance.location_node = Location.for_text(instance.location)
+    if instance.location_node_id:
+        instance.location = instance.location_node.full_name[:max_length]
+
+
+def index_item_trigrams(sender, instance, created, **kwargs):
+    """
+    After an item is saved, update its entries in the duplicate-detection
+    index if the indexed text changed.
+    """
+    old_instance = getattr(instance, '_old_instance', None)
+    if created or old_instance is None or any(
+        getattr(old_instance, field) != getattr(instance, field) for field in TRIGRAM_FIELDS
+    ):
+        index_item(instance)
+
+
 def log_item_change(sender, instance, created, **kwargs):
     """
     After a model is saved, this function runs.
@@ -34,7 +80,9 @@ def log_item_change(sender, instance, created, **kwargs):
                 old_value = getattr(old_instance, field_name)
                 new_value = getattr(instance, field_name)
 
-                if old_value != new_value and field_name != 'last_updated':
+                # Non-editable fields (last_updated, parsed spec values) follow
+                # from the fields that are logged
+                if old_value != new_value and field.editable:
                     verbose_name = field.verbose_name.capitalize()
                     changed_fields.append(f"{verbose_name} from '{old_value}' to '{new_value}'")
 
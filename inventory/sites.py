@@ -0,0 +1,57 @@
+import heapq
+from collections import Counter
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from .routers import active_site
+
+
+def fan_out(function, sites=None):
+    """
+    Call function(site) for each site (all of them by default) and return the
+    results as {site: result}, in site order. Each call runs in a thread of its
+    own with queries routed to that site, so the sites' databases are queried
+    in parallel and the slowest site sets the total time.
+    """
+    sites = list(sites or settings.INVENTORY_SITES)
+
+    def run(site):
+        with active_site(site):
+            try:
+                return function(site)
+            finally:
+                # Each thread opened its own connections; don't leave them behind
+                connections.close_all()
+
+    if len(sites) == 1:
+        with active_site(sites[0]):
+            return {sites[0]: function(sites[0])}
+
+    with ThreadPoolExecutor(max_workers=len(sites)) as executor:
+        return dict(zip(sites, executor.map(run, sites)))
+
+
+def merge_sorted(results, key, limit=None):
+    """
+    Merge each site's rows, already sorted by `key`, into one sorted list of
+    at most `limit` rows. If every site returned its first `limit` rows, these
+    are the first `limit` rows across all sites.
+    """
+    return list(islice(heapq.merge(*results.values(), key=key), limit))
+
+
+def merge_counts(results):
+    """
+    Add up per-site dicts of counts, nested dicts included, into site totals.
+    """
+    totals = {}
+    for counts in results.values():
+        for name, value in counts.items():
+            if isinstance(value, dict):
+                totals[name] = totals.get(name, Counter()) + Counter(value)
+            else:
+                totals[name] = totals.get(name, 0) + value
+    return {name: dict(value) if isinstance(value, Counter) else value for name, value in totals.items()}
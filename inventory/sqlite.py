@@ -0,0 +1,22 @@
+from django.conf import settings
+
+
+def production_pragmas():
+    """
+    The PRAGMA statements of the SQLite production profile, in the order they
+    are applied to each new connection.
+    """
+    return [f"PRAGMA {name}={value}" for name, value in settings.SQLITE_PRAGMAS.items()]
+
+
+def configure_connection(sender, connection, **kwargs):
+    """
+    Apply the production profile to every new SQLite connection when
+    SQLITE_PRODUCTION is switched on.
+    """
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRODUCTION:
+        return
+
+    with connection.cursor() as cursor:
+        for statement in production_pragmas():
+            cursor.execute(statement)
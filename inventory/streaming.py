@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+# Stands in for the table rows while the page around them is rendered
+ROWS_MARKER = '<!-- streamed rows -->'
+# Rows fetched per query and rendered per template call
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_streaming(request):
+    """
+    ?stream=1 or ?stream=0 picks the render mode for one request; otherwise
+    the STREAM_TABLES setting decides.
+    """
+    stream = request.GET.get('stream')
+    if stream in ('0', '1'):
+        return stream == '1'
+    return getattr(settings, 'STREAM_TABLES', False)
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_table(request, template_name, rows_template_name, context, rows, chunk_size=None):
+    """
+    Render `template_name` as a StreamingHttpResponse. The page is rendered
+    with `streaming` set and `rows_marker` where the table rows go; what comes
+    before the marker is sent at once, then `rows` (a queryset) is read
+    `chunk_size` rows at a time and each chunk is rendered with
+    `rows_template_name`, then the rest of the page. Only one chunk of rows is
+    in memory at a time. A page without the marker (e.g. "no items found")
+    is sent as it is.
+    """
+    page = render_to_string(template_name, {**context, 'streaming': True, 'rows_marker': mark_safe(ROWS_MARKER)},
+                            request)
+    head, marker, tail = page.partition(ROWS_MARKER)
+    rows_template = get_template(rows_template_name)
+    # The rows are read after the view has returned and the request's
+    # routing state is gone, so fix the database now
+    rows = rows.using(rows.db)
+
+    def content():
+        yield head
+        if marker:
+            for chunk in _chunks(rows, chunk_size or STREAM_CHUNK_SIZE):
+                yield rows_template.render({**context, 'rows': chunk})
+            yield tail
+
+    return StreamingHttpResponse(content(), content_type='text/html; charset=utf-8')
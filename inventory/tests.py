@@ -1,8 +1,48 @@
-from django.test import TestCase, Client
+import importlib
+import os
+import re
+import runpy
+import sqlite3
+import tempfile
+import threading
+
+from datetime import date, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.template import engines
+from django.test import TestCase, TransactionTestCase, Client, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.models import User, Group, Permission
-from .models import Status, Pump, Valve, LogEntry, RepairLog, BaseItem
+from django.db import connection, connections, transaction
+from .models import (
+    Status, Pump, Valve, Filter, LogEntry, RepairLog, BaseItem, MixTank, Location, ConcurrentUpdateError, ItemTrigram
+)
+from . import routers
+from .analytics import build_repair_analytics, get_repair_analytics
+from .duplicates import find_similar, trigrams
+from . import backup, labels, warmup
+from .overdue import notify_overdue_repairs, OVERDUE_ACTION
+from .pagination import EstimatedCountPaginator, estimated_row_count
+from .reference import STATUSES_CACHE_KEY, get_statuses
+from .sites import fan_out, merge_counts, merge_sorted
+from .middleware import PIN_PRIMARY_COOKIE
+from .management.commands.loadtest import compare_to_baseline, percentile
+from .query_budget import get_query_budget
+from .units import parse_quantity
+from .views import location_counts
+from . import urls as inventory_urls
+
+# For tests that would otherwise also query the sites in INVENTORY_SITE_URLS,
+# which a TestCase can't reach
+single_site = override_settings(INVENTORY_DEFAULT_SITE='main', INVENTORY_SITES={'main': 'default'})
 
 
 class StatusModelTest(TestCase):
@@ -178,4 +218,1248 @@ class InventoryViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
 
         # Check that the page HTML contains the expected error message
-        self.assertContains(response, "This field is required.")
\ No newline at end of file
+        self.assertContains(response, "This field is required.")
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        routers.begin_request()
+
+    def tearDown(self):
+        routers.end_request()
+
+    def test_list_views_read_from_replica(self):
+        for view_name in ['item_list', 'item_detail', 'log_history']:
+            routers.set_view(view_name)
+            self.assertEqual(self.router.db_for_read(BaseItem), 'replica1')
+
+    def test_other_views_read_from_primary(self):
+        routers.set_view('edit_item')
+        self.assertEqual(self.router.db_for_read(BaseItem), 'default')
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        routers.set_view('item_detail')
+        self.assertEqual(self.router.db_for_write(LogEntry), 'default')
+        self.assertEqual(self.router.db_for_read(BaseItem), 'default')
+
+    def test_pinned_client_reads_from_primary(self):
+        routers.begin_request(pinned=True)
+        routers.set_view('item_list')
+        self.assertEqual(self.router.db_for_read(BaseItem), 'default')
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'inventory'))
+        self.assertIsNone(self.router.allow_migrate('default', 'inventory'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_LAG_SECONDS=7)
+class ReplicaStickinessTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='manager', password='password123')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_baseitem'))
+        self.warehouse_status = Status.objects.create(name="Warehouse")
+
+    def test_write_pins_client_to_primary(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('add_item', kwargs={'category': 'Valve'}), data={
+            'item_id': 'V-600',
+            'status': self.warehouse_status.id,
+        })
+
+        self.assertEqual(Valve.objects.count(), 1)
+        cookie = response.cookies[PIN_PRIMARY_COOKIE]
+        self.assertEqual(cookie['max-age'], 7)
+
+
+class SQLiteProfileTest(SimpleTestCase):
+    databases = {'default'}
+
+    def _journal_mode(self):
+        # A fresh connection to a file database fires connection_created just
+        # like a new worker does
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {**connections['default'].settings_dict, 'NAME': os.path.join(directory, 'db.sqlite3')}
+            new_connection = connections['default'].__class__(settings_dict)
+            try:
+                with new_connection.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    return cursor.fetchone()[0]
+            finally:
+                new_connection.close()
+
+    @override_settings(SQLITE_PRODUCTION=True)
+    def test_production_profile_applies_pragmas(self):
+        self.assertEqual(self._journal_mode(), 'wal')
+
+    @override_settings(SQLITE_PRODUCTION=False)
+    def test_profile_is_opt_in(self):
+        self.assertEqual(self._journal_mode(), 'delete')
+
+
+class GenerateInventoryCommandTest(TestCase):
+
+    def test_generates_items_in_every_category(self):
+        call_command('generate_inventory', items=60, repairs=10, log_entries=50, stdout=StringIO())
+
+        self.assertEqual(BaseItem.objects.count(), 60)
+        self.assertEqual(Pump.objects.count(), 10)
+        self.assertEqual(MixTank.objects.count(), 10)
+        self.assertEqual(RepairLog.objects.count(), 10)
+        self.assertEqual(LogEntry.objects.count(), 50)
+
+        # Child rows are inserted directly, so they must line up with their BaseItem
+        pump = Pump.objects.first()
+        self.assertEqual(pump.category, "Pump")
+        self.assertTrue(pump.item_id.startswith("P-"))
+        self.assertTrue(pump.power)
+
+    def test_numbers_continue_after_deletions(self):
+        call_command('generate_inventory', items=12, repairs=0, log_entries=0, stdout=StringIO())
+        BaseItem.objects.filter(item_id__in=["P-0000001", "F-0000002"]).delete()
+        BaseItem.objects.create(item_id="P-12", category="Pump")
+
+        call_command('generate_inventory', items=6, repairs=0, log_entries=0, stdout=StringIO())
+        self.assertEqual(BaseItem.objects.count(), 17)
+        self.assertTrue(BaseItem.objects.filter(item_id="P-0000013").exists())
+
+
+class LoadTestReportTest(SimpleTestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_compare_to_baseline_flags_slower_and_chattier_scenarios(self):
+        baseline = {'scenarios': {'item_list': {'p95_ms': 100.0, 'max_queries': 4}}}
+        report = {'scenarios': {'item_list': {'p95_ms': 110.0, 'max_queries': 4}}}
+        self.assertEqual(compare_to_baseline(report, baseline, tolerance=0.25), [])
+
+        report = {'scenarios': {'item_list': {'p95_ms': 200.0, 'max_queries': 5}}}
+        self.assertEqual(len(compare_to_baseline(report, baseline, tolerance=0.25)), 2)
+
+
+@single_site
+class QueryBudgetTest(TestCase):
+    """
+    Every view with a query budget in urls.py must stay within it, and must run
+    the same number of queries with 10 rows as with 1000.
+    """
+
+    # Extra query strings to check for a view besides the plain URL
+    VARIANTS = {
+        'item_list': ['', '?format=print', '?q=pump', '?format=json', '?power_min=5&size_max=2'],
+        'item_typeahead': ['?q=m-0', '?field=location&q=b'],
+        'overdue_repair_list': ['', '?format=json', '?page=2'],
+        'site_search': ['?q=pump', '?q=pump&format=json'],
+        'site_summary': ['', '?format=json'],
+    }
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='admin', password='password123')
+        self.client.force_login(self.user)
+        self.statuses = [Status.objects.create(name=name) for name in ["Warehouse", "Repair", "In Service"]]
+        self.pump = Pump.objects.create(item_id="P-000", category="Pump", status=self.statuses[0])
+        self.repair = RepairLog.objects.create(item=self.pump, repair_company="Fix Co",
+                                               start_date=timezone.now().date(), description="Seal")
+        site = Location.objects.create(name="Main", kind="site")
+        self.bin = Location.objects.create(name="Bin 1", kind="bin", parent=site)
+        self.rows = 0
+
+    def _add_rows(self, total):
+        """
+        Grow every table a view lists (items, history, repairs) to `total` rows.
+        """
+        new = range(self.rows, total)
+        BaseItem.objects.bulk_create([
+            BaseItem(item_id=f"M-{n:04d}", category="Misc", description="pump part",
+                     status=self.statuses[n % len(self.statuses)], location_node=self.bin)
+            for n in new
+        ])
+        LogEntry.objects.bulk_create([
+            LogEntry(user=self.user, action="Updated", item_id_str=f"M-{n:04d}") for n in new
+        ])
+        RepairLog.objects.bulk_create([
+            # Every other one is overdue
+            RepairLog(item=self.pump, repair_company="Fix Co", start_date=timezone.now().date() - timedelta(days=9),
+                      expected_return_date=timezone.now().date() - timedelta(days=1), description="Seal",
+                      is_active=n % 2 == 0)
+            for n in new
+        ])
+        self.rows = total
+
+    def _url_kwargs(self, name):
+        return {
+            'item_detail': {'pk': self.pump.pk},
+            'edit_item': {'pk': self.pump.pk},
+            'delete_item': {'pk': self.pump.pk},
+            'add_item': {'category': 'Pump'},
+            'complete_repair': {'pk': self.repair.pk},
+        }.get(name, {})
+
+    def _measure(self):
+        results = {}
+        for pattern in inventory_urls.urlpatterns:
+            budget = get_query_budget(pattern.callback)
+            if budget is None:
+                continue
+            for variant in self.VARIANTS.get(pattern.name, ['']):
+                url = reverse(pattern.name, kwargs=self._url_kwargs(pattern.name)) + variant
+                # Budgets are for a cold cache
+                cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url)
+                self.assertLess(response.status_code, 400, url)
+                results[url] = (budget, [query['sql'] for query in context.captured_queries])
+        return results
+
+    def test_views_stay_within_query_budget(self):
+        self._add_rows(10)
+        small = self._measure()
+        self._add_rows(1000)
+        large = self._measure()
+
+        self.assertTrue(small)
+        for url, (budget, queries) in large.items():
+            with self.subTest(url=url):
+                report = "\n".join(queries)
+                self.assertLessEqual(len(queries), budget,
+                                     f"{url} ran {len(queries)} queries, budget is {budget}:\n{report}")
+                self.assertEqual(len(queries), len(small[url][1]),
+                                 f"{url} query count grows with rows:\n{report}")
+
+
+class ItemTypeaheadTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        for n, location in enumerate(["Building 1 / Aisle 2", "Building 2 / Aisle 1", "Yard"]):
+            BaseItem.objects.create(item_id=f"P-10{n}", category="Pump", location=location)
+        BaseItem.objects.create(item_id="V-100", category="Valve", location="Building 2 / Aisle 1")
+
+    def _values(self, **params):
+        response = self.client.get(reverse('item_typeahead'), params)
+        self.assertEqual(response.status_code, 200)
+        return [result['value'] for result in response.json()['results']]
+
+    def test_item_id_prefix_matches_in_order(self):
+        self.assertEqual(self._values(q="P-10"), ["P-100", "P-101", "P-102"])
+        self.assertEqual(self._values(q="p-10", limit=2), ["P-100", "P-101"])
+        self.assertEqual(self._values(q="V"), ["V-100"])
+
+    def test_bad_limits_fall_back(self):
+        self.assertEqual(self._values(q="P-10", limit=-3), ["P-100"])
+        self.assertEqual(self._values(q="P-10", limit=0), ["P-100"])
+        self.assertEqual(self._values(q="P-10", limit="many"), ["P-100", "P-101", "P-102"])
+
+    def test_prefix_does_not_match_inside_values(self):
+        self.assertEqual(self._values(q="10"), [])
+
+    def test_location_suggestions_are_distinct(self):
+        self.assertEqual(self._values(field="location", q="building"),
+                         ["Building 1 / Aisle 2", "Building 2 / Aisle 1"])
+
+    def test_unknown_field_returns_nothing(self):
+        self.assertEqual(self._values(field="description", q="P"), [])
+
+
+class SpecValueTest(TestCase):
+
+    def test_parse_quantity(self):
+        self.assertEqual(parse_quantity("7.5 HP", 'power'), (7.5, 'hp'))
+        self.assertEqual(parse_quantity("11 kW", 'power'), (14.7512, 'kw'))
+        self.assertEqual(parse_quantity("3,450 rpm", 'speed'), (3450.0, 'rpm'))
+        self.assertEqual(parse_quantity('1-1/2"', 'size'), (1.5, '"'))
+        self.assertEqual(parse_quantity("3/4 in", 'size'), (0.75, 'in'))
+        self.assertEqual(parse_quantity("50 mm", 'size'), (1.9685, 'mm'))
+        self.assertEqual(parse_quantity("2", 'size'), (2.0, 'in'))
+        self.assertEqual(parse_quantity("DN50", 'size'), (None, ''))
+        self.assertEqual(parse_quantity("", 'power'), (None, ''))
+
+    def test_values_follow_text_on_save(self):
+        pump = Pump.objects.create(item_id="P-1", category="Pump", power="5 HP", inlet='2"')
+        self.assertEqual(pump.power_value, 5.0)
+        self.assertEqual(pump.inlet_value, 2.0)
+
+        pump.power = "7.5 kW"
+        pump.save()
+        pump.refresh_from_db()
+        self.assertAlmostEqual(pump.power_value, 10.0577, places=3)
+        self.assertEqual(pump.power_unit, 'kw')
+
+        # The parsed columns are not logged as separate changes
+        details = LogEntry.objects.first().details
+        self.assertIn("Power from '5 HP' to '7.5 kW'", details)
+        self.assertNotIn("Power value", details)
+
+    def test_backfill_command(self):
+        pump = Pump.objects.create(item_id="P-1", category="Pump", power="10 HP")
+        Pump.objects.filter(pk=pump.pk).update(power_value=None, power_unit='')
+
+        call_command('backfill_spec_values', batch_size=1, stdout=StringIO())
+        pump.refresh_from_db()
+        self.assertEqual(pump.power_value, 10.0)
+
+    def test_item_list_range_filters(self):
+        Pump.objects.create(item_id="P-1", category="Pump", power="3 HP")
+        Pump.objects.create(item_id="P-2", category="Pump", power="7.5 kW")
+        MixTank.objects.create(item_id="MT-1", category="Mix Tank", power="8 HP")
+        Valve.objects.create(item_id="V-1", category="Valve", size='1"')
+        Valve.objects.create(item_id="V-2", category="Valve", size='3"')
+
+        def item_ids(**params):
+            response = self.client.get(reverse('item_list'), {'format': 'json', **params})
+            return [item['item_id'] for item in response.json()['results']]
+
+        self.assertEqual(item_ids(power_min=5, power_max=10), ["MT-1"])
+        self.assertEqual(item_ids(power_min=5), ["MT-1", "P-2"])
+        self.assertEqual(item_ids(size_min=2), ["V-2"])
+        self.assertEqual(item_ids(size_min="not a number"), ["MT-1", "P-1", "P-2", "V-1", "V-2"])
+        self.assertEqual(item_ids(size_min="nan", size_max="inf"), ["MT-1", "P-1", "P-2", "V-1", "V-2"])
+        self.assertEqual(item_ids(size_max="-inf"), ["MT-1", "P-1", "P-2", "V-1", "V-2"])
+
+        response = self.client.get(reverse('item_list'), {'format': 'json', 'size_min': 2})
+        self.assertEqual(response.json()['results'][0]['specs']['size'], {'text': '3"', 'value': 3.0, 'unit': '"'})
+
+    def test_filter_sizes(self):
+        Filter.objects.create(item_id="F-1", category="Filter", inlet='2"', outlet="50 mm")
+        Filter.objects.create(item_id="F-2", category="Filter", inlet='1"')
+        Pump.objects.create(item_id="P-1", category="Pump", inlet='3"')
+
+        response = self.client.get(reverse('item_list'), {'format': 'json', 'inlet_min': 1.5})
+        results = response.json()['results']
+        self.assertEqual([item['item_id'] for item in results], ["F-1", "P-1"])
+        self.assertEqual(results[0]['specs']['outlet'], {'text': "50 mm", 'value': 1.9685, 'unit': 'mm'})
+
+        Filter.objects.filter(item_id="F-2").update(inlet_value=None, inlet_unit='')
+        call_command('backfill_spec_values', stdout=StringIO())
+        self.assertEqual(Filter.objects.get(item_id="F-2").inlet_value, 1.0)
+
+    def test_item_list_json_paging(self):
+        for n in range(3):
+            Pump.objects.create(item_id=f"P-{n}", category="Pump")
+        url = reverse('item_list')
+        data = self.client.get(url, {'format': 'json', 'limit': -3, 'offset': -5}).json()
+        self.assertEqual((data['limit'], data['offset']), (1, 0))
+        self.assertEqual([item['item_id'] for item in data['results']], ["P-0"])
+        data = self.client.get(url, {'format': 'json', 'limit': 2, 'offset': 1}).json()
+        self.assertEqual([item['item_id'] for item in data['results']], ["P-1", "P-2"])
+        for params in [{'limit': 'ten'}, {'offset': '1.5'}]:
+            self.assertEqual(self.client.get(url, {'format': 'json', **params}).status_code, 400)
+
+
+class LocationTreeTest(TestCase):
+
+    def setUp(self):
+        self.site = Location.objects.create(name="Main", kind="site")
+        self.building = Location.objects.create(name="Building 2", kind="building", parent=self.site)
+        self.aisle = Location.objects.create(name="Aisle 3", kind="aisle", parent=self.building)
+        self.other = Location.objects.create(name="Building 3", kind="building", parent=self.site)
+
+    def test_paths_and_names(self):
+        self.assertEqual(self.aisle.path, f"{self.site.pk:06d}/{self.building.pk:06d}/{self.aisle.pk:06d}/")
+        self.assertEqual(self.aisle.full_name, "Main / Building 2 / Aisle 3")
+        self.assertEqual(self.aisle.depth, 2)
+        self.assertEqual(self.aisle.ancestor_ids(), [self.site.pk, self.building.pk])
+
+    def test_subtree_filter_and_counts(self):
+        Pump.objects.create(item_id="P-1", category="Pump", location_node=self.aisle)
+        Pump.objects.create(item_id="P-2", category="Pump", location_node=self.building)
+        Pump.objects.create(item_id="P-3", category="Pump", location_node=self.other)
+
+        in_building = BaseItem.objects.filter(self.building.subtree_q('location_node__path'))
+        self.assertEqual(sorted(in_building.values_list('item_id', flat=True)), ["P-1", "P-2"])
+        self.assertEqual(BaseItem.objects.get(item_id="P-1").location, "Main / Building 2 / Aisle 3")
+
+        counts = location_counts(BaseItem.objects.all(), self.site)
+        self.assertEqual([(child.name, count) for child, count in counts], [("Building 2", 2), ("Building 3", 1)])
+
+        response = self.client.get(reverse('item_list'), {'location': self.building.pk, 'format': 'json'})
+        self.assertEqual([item['item_id'] for item in response.json()['results']], ["P-1", "P-2"])
+
+    def test_rename_and_move_update_subtree(self):
+        pump = Pump.objects.create(item_id="P-1", category="Pump", location_node=self.aisle)
+
+        self.building.name = "Building 20"
+        self.building.save()
+        self.aisle.refresh_from_db()
+        self.assertEqual(self.aisle.full_name, "Main / Building 20 / Aisle 3")
+        pump.refresh_from_db()
+        self.assertEqual(pump.location, "Main / Building 20 / Aisle 3")
+
+        self.building.parent = None
+        self.building.save()
+        self.aisle.refresh_from_db()
+        self.assertEqual(self.aisle.path, f"{self.building.pk:06d}/{self.aisle.pk:06d}/")
+
+    def test_path_steps_must_fit(self):
+        node = Location(pk=10 ** (Location.PATH_STEP - 1), name="Far", kind="site")
+        with self.assertRaises(ValueError):
+            node._set_path()
+
+    def test_typed_location_picks_or_creates_a_node(self):
+        pump = Pump.objects.create(item_id="P-1", category="Pump", location="main > building 2 > Aisle 3")
+        self.assertEqual(pump.location_node, self.aisle)
+        self.assertEqual(pump.location, "Main / Building 2 / Aisle 3")
+
+        pump.location = "Main / Building 3 / Bin 7"
+        pump.save()
+        self.assertEqual(pump.location_node.parent, self.other)
+        self.assertEqual((pump.location_node.kind, pump.location), ("bin", "Main / Building 3 / Bin 7"))
+        self.assertEqual(Location.for_text("Yard / Shelf 4").kind, "building")
+
+        # A location picked from the tree wins over the text it replaces
+        pump.location_node = self.building
+        pump.save()
+        self.assertEqual(pump.location, "Main / Building 2")
+
+        pump.location = ""
+        pump.save()
+        self.assertIsNone(pump.location_node)
+
+    def test_stale_form_after_a_rename_keeps_the_tree(self):
+        user = User.objects.create_superuser(username='admin', password='password123')
+        self.client.force_login(user)
+        pump = Pump.objects.create(item_id="P-1", category="Pump", location_node=self.aisle)
+        stale = {'item_id': "P-1", 'location': pump.location, 'location_node': self.aisle.pk, 'version': pump.version}
+
+        self.building.name = "Building 20"
+        self.building.save()
+        self.client.post(reverse('edit_item', args=[pump.pk]), {**stale, 'vendor': "Goulds"})
+        self.assertEqual(list(Location.objects.values_list('name', flat=True)),
+                         ["Main", "Building 20", "Aisle 3", "Building 3"])
+
+        # The form reloaded after the conflict shows the new name, which isn't taken as typed
+        pump.refresh_from_db()
+        self.aisle.refresh_from_db()
+        self.client.post(reverse('edit_item', args=[pump.pk]), {**stale, 'vendor': "Goulds",
+                                                                 'location': self.aisle.full_name,
+                                                                 'version': pump.version})
+        pump.refresh_from_db()
+        self.assertEqual((pump.vendor, pump.location_node), ("Goulds", self.aisle))
+        self.assertEqual(Location.objects.count(), 4)
+
+    def test_items_with_only_text_are_linked_on_save(self):
+        pump = Pump.objects.create(item_id="P-1", category="Pump")
+        Pump.objects.filter(pk=pump.pk).update(location="Yard")
+        pump.refresh_from_db()
+        pump.save()
+        self.assertEqual(pump.location_node.full_name, "Yard")
+
+
+
+class LocationMigrationTest(TestCase):
+
+    def test_migration_maps_free_text_locations(self):
+        migration = importlib.import_module('inventory.migrations.0014_location_tree')
+        self.assertEqual(migration.split_location(" building 2 >Aisle  3 "), ["building 2", "Aisle 3"])
+
+        BaseItem.objects.create(item_id="A", category="Misc", location="Building 2 / Aisle 3")
+        BaseItem.objects.create(item_id="B", category="Misc", location="building 2, aisle 3")
+        BaseItem.objects.create(item_id="C", category="Misc", location="Building 2")
+
+        from django.apps import apps
+        migration.map_locations(apps, None)
+
+        self.assertEqual(Location.objects.count(), 2)
+        a, b, c = BaseItem.objects.order_by('item_id')
+        self.assertEqual(a.location_node, b.location_node)
+        self.assertEqual(a.location_node.parent, c.location_node)
+
+
+class BulkEditTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='manager', password='password123')
+        self.user.user_permissions.add(Permission.objects.get(codename='change_baseitem'))
+        self.client.force_login(self.user)
+        self.warehouse = Status.objects.create(name="Warehouse")
+        self.project = Status.objects.create(name="Project Alpha")
+        BaseItem.objects.bulk_create([
+            BaseItem(item_id=f"P-{n:03d}", category="Pump", status=self.warehouse, vendor="Goulds")
+            for n in range(30)
+        ] + [BaseItem(item_id="V-001", category="Valve", status=self.warehouse)])
+
+    def test_bulk_change_selected_items(self):
+        selected = list(BaseItem.objects.filter(item_id__in=["P-000", "P-001"]).values_list('pk', flat=True))
+        # Session, user and permissions, the chosen status, then one SELECT, one
+        # UPDATE and one INSERT inside a savepoint
+        with self.assertNumQueries(10):
+            response = self.client.post(reverse('bulk_edit_items'), {
+                'scope': 'selected', 'selected': selected, 'status': self.project.pk,
+            })
+        self.assertRedirects(response, reverse('item_list'), fetch_redirect_response=False)
+
+        self.assertEqual(BaseItem.objects.filter(status=self.project).count(), 2)
+        self.assertEqual(LogEntry.objects.count(), 2)
+        self.assertEqual(LogEntry.objects.first().details, "Status from 'Warehouse' to 'Project Alpha'")
+
+    def test_bulk_change_filtered_items(self):
+        location = Location.objects.create(name="Yard", kind="site")
+        self.client.post(reverse('bulk_edit_items'), {
+            'scope': 'filtered', 'filter': 'q=P-0', 'location_node': location.pk, 'vendor': 'Goulds',
+        })
+
+        moved = BaseItem.objects.filter(location_node=location)
+        self.assertEqual(moved.count(), 30)
+        self.assertEqual(moved.first().location, "Yard")
+        # Vendor was already Goulds, so only the location is logged
+        self.assertEqual(LogEntry.objects.count(), 30)
+        self.assertEqual(LogEntry.objects.first().details, "Location from '' to 'Yard'")
+
+    def test_bulk_edit_needs_a_change(self):
+        self.client.post(reverse('bulk_edit_items'), {'scope': 'filtered', 'filter': ''})
+        self.assertEqual(LogEntry.objects.count(), 0)
+        self.assertEqual(BaseItem.objects.filter(status=self.warehouse).count(), 31)
+
+
+class RepairAnalyticsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='viewer', password='password123')
+        self.client.force_login(self.user)
+        pump = Pump.objects.create(item_id="P-100", category="Pump")
+        valve = Valve.objects.create(item_id="V-100", category="Valve")
+        # (item, company, start, expected, end, cost)
+        repairs = [
+            (pump, "Fix Co", date(2024, 1, 5), date(2024, 1, 20), date(2024, 1, 15), 100),
+            (pump, "Fix Co", date(2024, 1, 10), date(2024, 1, 20), date(2024, 1, 30), 200),
+            (valve, "Fix Co", date(2024, 2, 1), date(2024, 2, 10), date(2024, 3, 2), 50),
+            (valve, "Valve Pros", date(2024, 2, 3), date(2024, 2, 10), None, 75),
+            (valve, "Valve Pros", date(2023, 6, 1), None, date(2023, 6, 5), 999),
+        ]
+        for item, company, start, expected, end, cost in repairs:
+            RepairLog.objects.create(item=item, repair_company=company, start_date=start, expected_return_date=expected,
+                                     end_date=end, cost=cost, description="Seal", is_active=end is None)
+
+    def test_report_aggregates_the_period(self):
+        report = build_repair_analytics(date(2024, 1, 1), date(2024, 12, 31), today=date(2024, 6, 1))
+
+        self.assertEqual(report['repairs'], 4)
+        self.assertEqual(report['total_spend'], 425.0)
+        self.assertEqual(report['spend_by_company'], [
+            {'month': '2024-01', 'company': 'Fix Co', 'total': 300.0, 'repairs': 2},
+            {'month': '2024-02', 'company': 'Fix Co', 'total': 50.0, 'repairs': 1},
+            {'month': '2024-02', 'company': 'Valve Pros', 'total': 75.0, 'repairs': 1},
+        ])
+        self.assertEqual(report['spend_by_category'], [
+            {'month': '2024-01', 'category': 'Pump', 'total': 300.0, 'repairs': 2},
+            {'month': '2024-02', 'category': 'Valve', 'total': 125.0, 'repairs': 2},
+        ])
+        # Completed turnarounds are 10, 20 and 30 days
+        self.assertEqual(report['turnaround_days'], {'mean': 20.0, 'p50': 20.0, 'p90': 30.0, 'p95': 30.0})
+        self.assertEqual(report['companies'], [
+            {'company': 'Fix Co', 'mean_turnaround_days': 20.0, 'completed_repairs': 3, 'total': 350.0},
+        ])
+        # Late return, plus one still out past its expected date
+        self.assertEqual(report['overdue'], {'repairs': 3, 'with_expected_date': 4, 'rate': 0.75})
+
+    def test_report_is_cached_until_a_repair_changes(self):
+        start, end = date(2024, 1, 1), date(2024, 12, 31)
+        self.assertEqual(get_repair_analytics(start, end)['repairs'], 4)
+        with self.assertNumQueries(0):
+            get_repair_analytics(start, end)
+
+        RepairLog.objects.filter(cost=999).update(start_date=date(2024, 3, 1))
+        self.assertEqual(get_repair_analytics(start, end)['repairs'], 4)
+
+        RepairLog.objects.get(cost=999).save()
+        self.assertEqual(get_repair_analytics(start, end)['repairs'], 5)
+
+    def test_cached_overdue_count_follows_the_day(self):
+        start, end = date(2024, 1, 1), date(2024, 12, 31)
+        self.assertEqual(get_repair_analytics(start, end, today=date(2024, 2, 5))['overdue']['repairs'], 2)
+        self.assertEqual(get_repair_analytics(start, end, today=date(2024, 2, 11))['overdue']['repairs'], 3)
+
+    def test_html_and_json(self):
+        url = reverse('repair_analytics')
+        response = self.client.get(url, {'start': '2024-01', 'end': '2024-02'})
+        self.assertContains(response, "Valve Pros")
+
+        data = self.client.get(url, {'start': '2024-01', 'end': '2024-02', 'format': 'json'}).json()
+        self.assertEqual((data['start'], data['end']), ('2024-01-01', '2024-02-29'))
+        self.assertEqual(data['repairs'], 4)
+
+        # Months given the wrong way round cover the same whole months
+        data = self.client.get(url, {'start': '2024-02', 'end': '2024-01', 'format': 'json'}).json()
+        self.assertEqual((data['start'], data['end']), ('2024-01-01', '2024-02-29'))
+        self.assertEqual(data['repairs'], 4)
+
+
+@single_site
+class OverdueRepairTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username='viewer', password='password123'))
+        self.today = timezone.localdate()
+        days = lambda n: self.today - timedelta(days=n)
+        pump = Pump.objects.create(item_id="P-100", category="Pump")
+        self.late = RepairLog.objects.create(item=pump, repair_company="Fix Co", start_date=days(30),
+                                             expected_return_date=days(12), description="Seal")
+        # Due today, finished late, and without an expected date: none are overdue
+        RepairLog.objects.create(item=pump, repair_company="Fix Co", start_date=days(30),
+                                 expected_return_date=self.today, description="Seal")
+        RepairLog.objects.create(item=pump, repair_company="Fix Co", start_date=days(60),
+                                 expected_return_date=days(50), end_date=days(30),
+                                 is_active=False, description="Seal")
+        RepairLog.objects.create(item=pump, repair_company="Fix Co", start_date=days(60), description="Seal")
+
+    def test_scan_alerts_each_overdue_repair_once(self):
+        self.assertEqual(notify_overdue_repairs(self.today, batch_size=1), 1)
+        self.assertEqual(notify_overdue_repairs(self.today), 0)
+
+        alert = LogEntry.objects.get(action=OVERDUE_ACTION)
+        self.assertEqual(alert.item_id_str, "P-100")
+        self.assertIn("12 days overdue", alert.details)
+        self.late.refresh_from_db()
+        self.assertEqual(self.late.overdue_notified_on, self.today)
+
+    def test_extended_repair_is_alerted_again(self):
+        notify_overdue_repairs(self.today)
+        RepairLog.objects.filter(pk=self.late.pk).update(expected_return_date=self.today)
+        self.assertEqual(notify_overdue_repairs(self.today), 0)
+
+        # Both the extended repair and the one due today are now overdue
+        self.assertEqual(notify_overdue_repairs(self.today + timedelta(days=1)), 2)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('scan_overdue_repairs', stdout=out)
+        self.assertIn("1 overdue repair alert written", out.getvalue())
+
+    def test_overdue_list(self):
+        data = self.client.get(reverse('overdue_repair_list'), {'format': 'json'}).json()
+        self.assertEqual([(row['id'], row['days_overdue']) for row in data['results']], [(self.late.pk, 12)])
+        self.assertContains(self.client.get(reverse('overdue_repair_list')), "P-100")
+
+    def test_overdue_list_is_paged(self):
+        pump = Pump.objects.get(item_id="P-100")
+        RepairLog.objects.bulk_create([
+            RepairLog(item=pump, repair_company="Late Co", start_date=self.today - timedelta(days=40),
+                      expected_return_date=self.today - timedelta(days=n), description="Seal")
+            for n in range(20, 22)
+        ])
+        url = reverse('overdue_repair_list')
+        with mock.patch('inventory.views.OVERDUE_PAGE_SIZE', 2):
+            first = self.client.get(url, {'format': 'json'}).json()
+            last = self.client.get(url, {'format': 'json', 'page': 2}).json()
+            self.assertContains(self.client.get(url), "Page 1 of 2")
+        self.assertEqual((first['count'], first['num_pages'], len(first['results'])), (3, 2, 2))
+        self.assertEqual([row['id'] for row in last['results']], [self.late.pk])
+
+
+class OptimisticConcurrencyTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='password123'))
+        self.warehouse = Status.objects.create(name="Warehouse")
+        self.repair_status = Status.objects.create(name="Repair")
+        self.pump = Pump.objects.create(item_id="P-100", category="Pump", vendor="Goulds", status=self.warehouse)
+
+    def _edit(self, version, **changes):
+        data = {'item_id': "P-100", 'vendor': "Goulds", 'status': self.warehouse.pk, 'version': version, **changes}
+        return self.client.post(reverse('edit_item', args=[self.pump.pk]), data)
+
+    def test_stale_save_raises(self):
+        mine, theirs = Pump.objects.get(pk=self.pump.pk), Pump.objects.get(pk=self.pump.pk)
+        theirs.vendor = "Grundfos"
+        theirs.save()
+        self.assertEqual(theirs.version, 2)
+
+        mine.vendor = "Flowserve"
+        # Like an IntegrityError, the conflict breaks the surrounding transaction
+        with self.assertRaises(ConcurrentUpdateError), transaction.atomic():
+            mine.save()
+        self.assertEqual(mine.version, 1)
+        self.assertEqual(Pump.objects.get(pk=self.pump.pk).vendor, "Grundfos")
+
+    def test_update_fields_bumps_version(self):
+        self.pump.vendor = "Grundfos"
+        self.pump.save(update_fields=['vendor'])
+        self.assertEqual(BaseItem.objects.get(pk=self.pump.pk).version, 2)
+
+    def test_edit_conflict_shows_diff(self):
+        self.assertRedirects(self._edit(1, vendor="Grundfos"), reverse('item_detail', args=[self.pump.pk]))
+
+        response = self._edit(1, vendor="Flowserve")
+        self.assertContains(response, "Someone else saved this pump", status_code=409)
+        self.assertEqual(response.context['differences'], [("Vendor", "Flowserve", "Grundfos")])
+        self.assertIn(('version', 2), response.context['resubmit'])
+        self.assertEqual(Pump.objects.get(pk=self.pump.pk).vendor, "Grundfos")
+
+        # Resubmitting against the current version goes through
+        self._edit(2, vendor="Flowserve")
+        self.assertEqual(Pump.objects.get(pk=self.pump.pk).vendor, "Flowserve")
+
+    def test_stale_repair_is_not_completed(self):
+        repair = RepairLog.objects.create(item=self.pump, repair_company="Fix Co", start_date=date(2024, 5, 1),
+                                          description="Seal")
+        repair.cost = 100
+        repair.save()
+
+        response = self.client.post(reverse('complete_repair', args=[repair.pk]), {'version': 1}, follow=True)
+        self.assertContains(response, "The repair for P-100 was changed by someone else")
+        self.assertTrue(RepairLog.objects.get(pk=repair.pk).is_active)
+
+        self.client.post(reverse('complete_repair', args=[repair.pk]), {'version': 2})
+        self.assertFalse(RepairLog.objects.get(pk=repair.pk).is_active)
+
+    def test_stale_item_rolls_back_the_completion(self):
+        repair = RepairLog.objects.create(item=self.pump, repair_company="Fix Co", start_date=date(2024, 5, 1),
+                                          description="Seal")
+
+        def stale_save(item, *args, **kwargs):
+            raise ConcurrentUpdateError(item)
+
+        with mock.patch.object(BaseItem, 'save', stale_save):
+            response = self.client.post(reverse('complete_repair', args=[repair.pk]), {'version': 1}, follow=True)
+        self.assertContains(response, "P-100 was changed by someone else while its repair was being completed")
+        self.assertTrue(RepairLog.objects.get(pk=repair.pk).is_active)
+
+    def test_location_rename_conflicts_with_open_edit_forms(self):
+        site = Location.objects.create(name="Main", kind="site")
+        building = Location.objects.create(name="Building 2", kind="building", parent=site)
+        self.pump.location_node = building
+        self.pump.save()
+        version = Pump.objects.get(pk=self.pump.pk).version
+
+        building.name = "Building 20"
+        building.save()
+        response = self._edit(version, location="Main / Building 2", location_node=building.pk)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Pump.objects.get(pk=self.pump.pk).location, "Main / Building 20")
+
+    def test_queryset_updates_bump_version(self):
+        self.client.post(reverse('bulk_edit_items'), {
+            'scope': 'selected', 'selected': [self.pump.pk], 'vendor': "Grundfos",
+        })
+        self.assertEqual(self._edit(1).status_code, 409)
+
+
+class ScalableAdminTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='password123'))
+        status = Status.objects.create(name="Warehouse")
+        for n in range(12):
+            pump = Pump.objects.create(item_id=f"P-{n:03d}", category="Pump", location=f"Bin {n}", status=status)
+            RepairLog.objects.create(item=pump, repair_company="Fix Co", start_date=date(2024, 1, 1), description="Seal")
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def test_estimated_row_count(self):
+        self.assertEqual(estimated_row_count(Pump), 12)
+        self.assertEqual(estimated_row_count(RepairLog), 12)
+
+    def test_paginator_estimates_only_unfiltered_lists(self):
+        class LowThresholdPaginator(EstimatedCountPaginator):
+            estimate_threshold = 5
+
+        Pump.objects.filter(item_id="P-000").delete()
+        # Statistics are stale until the next ANALYZE
+        self.assertEqual(LowThresholdPaginator(Pump.objects.all(), 10).count, 12)
+        self.assertEqual(EstimatedCountPaginator(Pump.objects.all(), 10).count, 11)
+        self.assertEqual(LowThresholdPaginator(Pump.objects.filter(location__startswith="Bin 1"), 10).count, 3)
+
+    def test_changelists_do_not_query_per_row(self):
+        for url in [reverse('admin:inventory_pump_changelist'), reverse('admin:inventory_repairlog_changelist')]:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as small:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            pump = Pump.objects.create(item_id=f"P-1{len(url)}", category="Pump")
+            RepairLog.objects.create(item=pump, repair_company="Fix Co", start_date=date(2024, 1, 1),
+                                     description="Seal")
+            with self.subTest(url=url), self.assertNumQueries(len(small.captured_queries)):
+                self.client.get(url)
+
+    def test_search_is_a_prefix_match(self):
+        response = self.client.get(reverse('admin:inventory_pump_changelist'), {'q': 'p-01'})
+        self.assertEqual([item.item_id for item in response.context['cl'].result_list], ["P-010", "P-011"])
+        response = self.client.get(reverse('admin:inventory_pump_changelist'), {'q': '01'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+
+class DuplicateDetectionTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='password123'))
+        self.pump = Pump.objects.create(item_id="P-1001", category="Pump", vendor="Grundfos",
+                                        description="Centrifugal feed pump, 316 SS")
+        Pump.objects.create(item_id="P-2002", category="Pump", vendor="Goulds", description="Sump pump")
+        Valve.objects.create(item_id="V-3003", category="Valve", vendor="Swagelok", description="Ball valve")
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams("P-101"), {'  p', ' p ', '  1', ' 10', '101', '01 '})
+
+    def test_finds_near_duplicates_through_the_index(self):
+        candidate = Pump(item_id="P1001", vendor="Grundfos", description="Centrifugal feed pump 316SS")
+        # Candidate lookup, their trigram totals, and the matching items
+        with self.assertNumQueries(3):
+            matches = find_similar(candidate)
+        self.assertEqual([item.item_id for item, similarity in matches], ["P-1001"])
+        self.assertGreater(matches[0][1], 0.5)
+
+        # An item is not its own duplicate
+        self.assertEqual(find_similar(self.pump), [])
+
+    def test_index_follows_edits(self):
+        self.pump.description = "Diaphragm metering pump"
+        self.pump.save()
+        self.assertIn('dia', set(self.pump.trigrams.values_list('gram', flat=True)))
+        self.assertNotIn('cen', set(self.pump.trigrams.values_list('gram', flat=True)))
+
+        self.client.post(reverse('bulk_edit_items'), {
+            'scope': 'selected', 'selected': [self.pump.pk], 'vendor': "Flowserve",
+        })
+        self.assertIn('flo', set(self.pump.trigrams.values_list('gram', flat=True)))
+
+    def test_add_item_warns_about_duplicates(self):
+        data = {'item_id': "P-1001A", 'vendor': "Grundfos", 'description': "Centrifugal feed pump, 316 SS"}
+        response = self.client.post(reverse('add_item', args=['Pump']), data)
+        self.assertContains(response, "looks like one that is already in the inventory")
+        self.assertFalse(BaseItem.objects.filter(item_id="P-1001A").exists())
+
+        self.client.post(reverse('add_item', args=['Pump']), {**data, 'confirm_duplicate': '1'})
+        self.assertTrue(BaseItem.objects.filter(item_id="P-1001A").exists())
+
+    def test_command(self):
+        Pump.objects.create(item_id="P-1001-B", category="Pump", vendor="Grundfos",
+                            description="Centrifugal feed pump 316 SS")
+        ItemTrigram.objects.all().delete()
+
+        out = StringIO()
+        call_command('find_duplicates', '--rebuild', stdout=out)
+        self.assertIn("Indexed 4 items.", out.getvalue())
+        self.assertIn("P-1001\tP-1001-B", out.getvalue())
+        self.assertIn("1 likely duplicate pair found.", out.getvalue())
+
+
+@override_settings(LABEL_RENDER_PROCESSES=0)
+class LabelSheetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username='viewer', password='password123'))
+        for n in range(35):
+            BaseItem.objects.create(item_id=f"P-{n:04d}", category="Pump")
+        BaseItem.objects.create(item_id="V-0001", category="Valve")
+
+    def _decode_code128(self, widths):
+        patterns = {pattern: value for value, pattern in enumerate(labels.CODE128_PATTERNS)}
+        modules = ''.join(map(str, widths))
+        values = [patterns[modules[start:start + 6]] for start in range(0, len(modules) - 7, 6)]
+        *data, checksum = values
+        self.assertEqual((data[0] + sum(n * value for n, value in enumerate(data[1:], 1))) % 103, checksum)
+
+        text, code_set = '', {104: 'B', 105: 'C'}[data[0]]
+        for value in data[1:]:
+            if (code_set, value) in {('B', 99), ('C', 100)}:
+                code_set = 'C' if value == 99 else 'B'
+            else:
+                text += chr(value + 32) if code_set == 'B' else f'{value:02d}'
+        return text
+
+    def test_code128(self):
+        for text in ["P-0001", "MT-12 ab", "12345", "CC-0001234", "A1234567B"]:
+            self.assertEqual(self._decode_code128(labels.code128_widths(text)), text)
+        # Long digit runs are packed two per symbol
+        self.assertLess(len(labels.code128_widths("P-00001234")), len(labels.code128_widths("P-ABCDEFGH")))
+
+    def _pdf(self, response):
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        return b''.join(response.streaming_content)
+
+    def test_pdf_structure(self):
+        pdf = b''.join(labels.label_sheet_pdf((f"P-{n}", f"http://testserver/item/{n}/") for n in range(31)))
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertIn(b'/Count 2', pdf)
+
+        # The cross-reference table points at every object
+        xref_offset = int(re.search(rb'startxref\n(\d+)', pdf)[1])
+        self.assertTrue(pdf[xref_offset:].startswith(b'xref'))
+        offsets = re.findall(rb'(\d{10}) 00000 n', pdf)
+        for number, offset in enumerate(offsets, 1):
+            self.assertTrue(pdf[int(offset):].startswith(b'%d 0 obj' % number))
+
+    def test_labels_for_the_filtered_list(self):
+        with mock.patch('inventory.labels.render_label', wraps=labels.render_label) as render:
+            pdf = self._pdf(self.client.get(reverse('item_list'), {'format': 'labels', 'q': 'P-'}))
+            self.assertEqual(render.call_count, 35)
+            self.assertIn(b'/Count 2', pdf)
+
+            # Drawings are cached per item
+            self.assertEqual(self._pdf(self.client.get(reverse('item_list'), {'format': 'labels', 'q': 'P-'})), pdf)
+            self.assertEqual(render.call_count, 35)
+            item = BaseItem.objects.get(item_id="P-0000")
+            render.assert_any_call("P-0000", f"http://testserver{item.get_absolute_url()}")
+
+    def test_labels_need_a_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('item_list'), {'format': 'labels'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
+
+    @override_settings(LABEL_RENDER_PROCESSES=2)
+    def test_process_pool_draws_the_same_labels(self):
+        labels._executor = None
+        try:
+            pooled = self._pdf(self.client.get(reverse('item_list'), {'format': 'labels'}))
+        finally:
+            labels._executor.shutdown()
+            labels._executor = None
+        cache.clear()
+        with override_settings(LABEL_RENDER_PROCESSES=0):
+            self.assertEqual(self._pdf(self.client.get(reverse('item_list'), {'format': 'labels'})), pooled)
+
+
+@override_settings(INVENTORY_DEFAULT_SITE='main', INVENTORY_SITES={'main': 'default', 'north': 'site_north'})
+class ShardRouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routers.ShardRouter()
+
+    def _loaded_from(self, obj, db):
+        obj._state.db = db
+        return obj
+
+    def test_default_site_is_left_to_the_replica_router(self):
+        self.assertIsNone(self.router.db_for_read(BaseItem))
+        self.assertIsNone(self.router.db_for_write(RepairLog))
+
+    def test_inventory_follows_the_current_site(self):
+        with routers.active_site('north'):
+            for model in [BaseItem, Pump, RepairLog, LogEntry, Status, ItemTrigram]:
+                self.assertEqual(self.router.db_for_read(model), 'site_north')
+                self.assertEqual(self.router.db_for_write(model), 'site_north')
+            # Users and sessions are shared
+            self.assertIsNone(self.router.db_for_read(User))
+        self.assertEqual(routers.current_site(), 'main')
+
+    def test_lookups_from_an_object_stay_with_it(self):
+        item = self._loaded_from(BaseItem(), 'site_north')
+        log = self._loaded_from(LogEntry(), 'site_north')
+        self.assertEqual(self.router.db_for_read(Status, instance=item), 'site_north')
+        self.assertEqual(self.router.db_for_read(User, instance=log), 'default')
+        with routers.active_site('north'):
+            self.assertIsNone(self.router.db_for_read(Status, instance=self._loaded_from(BaseItem(), 'default')))
+
+    def test_data_migrations_use_the_database_being_migrated(self):
+        routers.begin_migration(using='site_north')
+        try:
+            self.assertEqual(self.router.db_for_write(Location), 'site_north')
+            self.assertEqual(self.router.db_for_read(ItemTrigram), 'site_north')
+            self.assertIsNone(self.router.db_for_read(User))
+        finally:
+            routers.end_migration()
+        self.assertIsNone(self.router.db_for_write(Location))
+
+    def test_relations(self):
+        user = self._loaded_from(User(), 'default')
+        north = self._loaded_from(BaseItem(), 'site_north')
+        self.assertTrue(self.router.allow_relation(self._loaded_from(LogEntry(), 'site_north'), user))
+        self.assertTrue(self.router.allow_relation(north, self._loaded_from(RepairLog(), 'site_north')))
+        self.assertFalse(self.router.allow_relation(north, self._loaded_from(RepairLog(), 'default')))
+
+    def test_new_rows_belong_to_the_current_site(self):
+        with routers.active_site('north'):
+            self.assertEqual(LogEntry().site, 'north')
+        self.assertEqual(RepairLog().site, 'main')
+
+    def test_merging_site_results(self):
+        results = {'main': [('A', 1), ('C', 3)], 'north': [('B', 2), ('D', 4)]}
+        self.assertEqual(merge_sorted(results, key=lambda row: row[0], limit=3), [('A', 1), ('B', 2), ('C', 3)])
+        totals = merge_counts({
+            'main': {'items': 2, 'by_status': {'Warehouse': 2}},
+            'north': {'items': 3, 'by_status': {'Warehouse': 1, 'Repair': 2}},
+        })
+        self.assertEqual(totals, {'items': 5, 'by_status': {'Warehouse': 3, 'Repair': 2}})
+
+
+# The fan-out threads can only see committed rows, hence TransactionTestCase
+@override_settings(INVENTORY_DEFAULT_SITE='main', INVENTORY_SITES={'main': 'default', 'north': 'site_north'})
+class SiteFanOutTest(TransactionTestCase):
+    databases = {'default', 'site_north'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='manager', password='password123')
+        self.client.force_login(self.user)
+        for site in ['main', 'north']:
+            with routers.active_site(site):
+                status = Status.objects.create(name="Warehouse")
+                Pump.objects.create(item_id="P-1", category="Pump", status=status)
+                Valve.objects.create(item_id="V-1", category="Valve", status=status)
+        with routers.active_site('north'):
+            Pump.objects.create(item_id="P-2", category="Pump", status=status)
+
+    def test_sites_keep_their_own_rows(self):
+        self.assertEqual(BaseItem.objects.count(), 2)
+        self.assertEqual(BaseItem.objects.using('site_north').count(), 3)
+        self.assertEqual(set(BaseItem.objects.using('site_north').values_list('site', flat=True)), {'north'})
+
+    def test_fan_out_queries_every_site(self):
+        results = fan_out(lambda site: (routers.current_site(), BaseItem.objects.count()))
+        self.assertEqual(results, {'main': ('main', 2), 'north': ('north', 3)})
+
+    def test_search_merges_sites(self):
+        response = self.client.get(reverse('site_search'), {'q': '-1', 'format': 'json'})
+        results = response.json()['results']
+        self.assertEqual([(result['item_id'], result['site']) for result in results],
+                         [("P-1", 'main'), ("P-1", 'north'), ("V-1", 'main'), ("V-1", 'north')])
+        north_pump = BaseItem.objects.using('site_north').get(item_id="P-1")
+        self.assertEqual(results[1]['url'], f"{reverse('item_detail', args=[north_pump.pk])}?site=north")
+
+        response = self.client.get(reverse('site_search'), {'q': '-1', 'format': 'json', 'limit': -3})
+        self.assertEqual([result['item_id'] for result in response.json()['results']], ["P-1"])
+
+    def test_summary_totals(self):
+        report = self.client.get(reverse('site_summary'), {'format': 'json'}).json()
+        self.assertEqual(report['sites']['north']['by_status'], {'Warehouse': 3})
+        self.assertEqual(report['total']['items'], 5)
+
+    def test_links_name_the_item_site(self):
+        north_pump = BaseItem.objects.using('site_north').get(item_id="P-2")
+        response = self.client.get(reverse('item_list'), {'site': 'north', 'q': 'P-2'})
+        self.assertContains(response, f'href="{reverse("item_detail", args=[north_pump.pk])}?site=north"')
+        # Followed from the main site, the link opens the north site's item
+        self.client.get(reverse('item_list'), {'site': 'main'})
+        response = self.client.get(north_pump.get_absolute_url())
+        self.assertContains(response, "P-2")
+
+    def test_site_choice_is_kept_in_the_session(self):
+        self.assertEqual(self.client.get(reverse('item_list'), {'site': 'north'}).wsgi_request.site, 'north')
+        self.assertEqual(self.client.get(reverse('item_list')).wsgi_request.site, 'north')
+        self.assertEqual(self.client.get(reverse('item_list'), {'site': 'nowhere'}).wsgi_request.site, 'north')
+
+
+class StreamingTableTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='password123')
+        self.client.force_login(self.user)
+        status = Status.objects.create(name="Warehouse")
+        for n in range(5):
+            Pump.objects.create(item_id=f"P-{n}", category="Pump", status=status, description=f"Pump {n}")
+
+    def _page(self, url, params):
+        response = self.client.get(url, params)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, re.sub(rb'name="csrfmiddlewaretoken" value="[^"]*"', b'', content)
+
+    def test_streamed_pages_match_rendered_ones(self):
+        for url, params in [(reverse('item_list'), {}), (reverse('item_list'), {'format': 'print'}),
+                            (reverse('log_history'), {})]:
+            streamed_response, streamed = self._page(url, {**params, 'stream': '1'})
+            rendered_response, rendered = self._page(url, {**params, 'stream': '0'})
+            self.assertTrue(streamed_response.streaming)
+            self.assertFalse(rendered_response.streaming)
+            # The query strings differ only in ?stream=
+            self.assertEqual(streamed.replace(b'stream=1', b'stream=0'), rendered)
+            self.assertNotIn(b'streamed rows', streamed)
+        self.assertIn(b'admin', streamed)
+
+    @override_settings(STREAM_TABLES=True)
+    def test_rows_are_sent_in_chunks(self):
+        with mock.patch('inventory.streaming.STREAM_CHUNK_SIZE', 2):
+            response = self.client.get(reverse('item_list'))
+            parts = list(response.streaming_content)
+        # Head, three chunks of rows, tail
+        self.assertEqual(len(parts), 5)
+        self.assertIn(b'<tbody>', parts[0])
+        self.assertNotIn(b'P-0', parts[0])
+        self.assertEqual([part.count(b'<tr>') for part in parts[1:4]], [2, 2, 1])
+        self.assertIn(b'</tbody>', parts[4])
+
+    @override_settings(STREAM_TABLES=True)
+    def test_empty_list_while_streaming(self):
+        response = self.client.get(reverse('item_list'), {'q': 'nothing like this'})
+        self.assertIn(b'No items found', b''.join(response.streaming_content))
+
+
+class WarmupTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Status.objects.create(name="Warehouse")
+
+    def test_warm_up_compiles_templates_and_primes_caches(self):
+        timings = warmup.warm_up()
+        self.assertEqual([name for name, count, seconds in timings],
+                         ['URL names resolved', 'templates compiled', 'site caches primed',
+                          'database connections opened'])
+
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIn('inventory/item_list.html', warmup.template_names())
+        self.assertIn('inventory/item_list.html', loader.get_template_cache)
+
+        # The item list takes its statuses from the primed cache
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual([status.name for status in get_statuses()], ["Warehouse"])
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_pre_fork_warm_up_leaves_caches_and_connections_alone(self):
+        timings = warmup.warm_up(caches=False, connect=False)
+        self.assertEqual([name for name, count, seconds in timings], ['URL names resolved', 'templates compiled'])
+        self.assertIsNone(cache.get(STATUSES_CACHE_KEY.format(site=routers.current_site())))
+
+    def test_workers_prime_their_own_caches_after_the_fork(self):
+        config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+        worker = mock.Mock(pid=123)
+        config['post_fork'](mock.Mock(), worker)
+        lines = [call.args[0] for call in worker.log.info.call_args_list]
+        self.assertTrue(any(line.startswith("Worker 123: 1 site caches primed in") for line in lines))
+        self.assertNotIn("templates compiled", ' '.join(lines))
+        self.assertIsNotNone(cache.get(STATUSES_CACHE_KEY.format(site=routers.current_site())))
+
+    def test_status_changes_clear_the_cache(self):
+        get_statuses()
+        Status.objects.create(name="Repair")
+        self.assertEqual([status.name for status in get_statuses()], ["Repair", "Warehouse"])
+        Status.objects.get(name="Repair").delete()
+        self.assertEqual([status.name for status in get_statuses()], ["Warehouse"])
+
+    def test_command_reports_timings(self):
+        out = StringIO()
+        call_command('warmup', '--skip-reports', stdout=out)
+        self.assertIn("templates compiled in", out.getvalue())
+        self.assertIn("Warm-up took", out.getvalue())
+
+
+class BackupTest(TransactionTestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.media = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(BACKUP_ROOT=self.root.name, MEDIA_ROOT=self.media.name)
+        self.settings_override.enable()
+        Pump.objects.create(item_id="P-1", category="Pump")
+        self.document = os.path.join(self.media.name, 'item_documents', 'manual.pdf')
+        os.makedirs(os.path.dirname(self.document))
+        with open(self.document, 'wb') as file:
+            file.write(b'%PDF manual')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.root.cleanup()
+        self.media.cleanup()
+
+    def _backup(self):
+        out = StringIO()
+        call_command('backup', stdout=out)
+        return out.getvalue()
+
+    def test_media_is_stored_once(self):
+        self.assertIn("1 media files, 1 new or changed", self._backup())
+        self.assertIn("1 media files, 0 new or changed", self._backup())
+        first, second = backup.list_snapshots()
+        self.assertEqual(backup.load_manifest(first)['media'], backup.load_manifest(second)['media'])
+        self.assertEqual(len(list(Path(self.root.name, 'objects').glob('*/*'))), 1)
+        self.assertEqual(backup.verify_snapshot(second, rehash_media=True), [])
+
+        call_command('backup', '--keep', '1', stdout=StringIO())
+        self.assertEqual(len(backup.list_snapshots()), 1)
+        self.assertEqual(len(list(Path(self.root.name, 'objects').glob('*/*'))), 1)
+
+    def test_restore(self):
+        self._backup()
+        name = backup.list_snapshots()[0]
+        BaseItem.objects.all().delete()
+        with open(self.document, 'wb') as file:
+            file.write(b'overwritten')
+        extra = os.path.join(self.media.name, 'item_documents', 'new.pdf')
+        with open(extra, 'wb') as file:
+            file.write(b'new')
+
+        call_command('restore', '--noinput', '--prune-media', stdout=StringIO())
+        self.assertEqual(list(BaseItem.objects.values_list('item_id', flat=True)), ["P-1"])
+        with open(self.document, 'rb') as file:
+            self.assertEqual(file.read(), b'%PDF manual')
+        self.assertFalse(os.path.exists(extra))
+
+        with self.assertRaises(CommandError):
+            call_command('restore', '--noinput', '--at', '2000-01-01', stdout=StringIO())
+        for impossible in ['2026-02-30', '2026-10-01T25:00']:
+            with self.assertRaisesMessage(CommandError, f"Can't read '{impossible}'"):
+                call_command('restore', '--noinput', '--at', impossible, stdout=StringIO())
+        self.assertEqual(backup.find_snapshot(at=timezone.now()), name)
+
+    def test_prune_waits_for_running_backup(self):
+        self._backup()
+        pruner = threading.Thread(target=backup.prune_snapshots, args=(0,))
+        with backup._backup_lock(self.root.name):
+            pruner.start()
+            pruner.join(0.2)
+            self.assertTrue(pruner.is_alive())
+            self.assertEqual(len(backup.list_snapshots()), 1)
+        pruner.join()
+        self.assertEqual(backup.list_snapshots(), [])
+
+    @mock.patch.multiple(backup, SQLITE_STEP_PAGES=1, SQLITE_STEP_SLEEP=0.005, SQLITE_MAX_RESTARTS=3)
+    def test_sqlite_backup_without_wal_lets_writers_in(self):
+        path = os.path.join(self.root.name, 'live.sqlite3')
+        source = sqlite3.connect(path, check_same_thread=False)
+        self.addCleanup(source.close)
+        self.assertEqual(source.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        source.execute('CREATE TABLE log (text TEXT)')
+        source.executemany('INSERT INTO log VALUES (?)', [('x' * 500,)] * 200)
+        source.commit()
+
+        stop = threading.Event()
+        written = []
+
+        def write():
+            writer = sqlite3.connect(path, timeout=5)
+            while not stop.is_set():
+                writer.execute("INSERT INTO log VALUES ('y')")
+                writer.commit()
+                written.append(1)
+                stop.wait(0.001)
+            writer.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        target = sqlite3.connect(':memory:')
+        try:
+            # The writer keeps committing between steps, so the copy never finishes
+            with self.assertRaisesMessage(backup.BackupError, "WAL mode"):
+                backup.sqlite_backup(source, target)
+        finally:
+            stop.set()
+            writer.join()
+        self.assertGreater(len(written), 0)
+
+        backup.sqlite_backup(source, target)
+        self.assertEqual(target.execute('SELECT COUNT(*) FROM log').fetchone()[0], 200 + len(written))
+
+    def test_backup_that_fails_verification_is_not_published(self):
+        self._backup()
+        # The next backup reuses the unchanged document's blob without reading it
+        for blob in Path(self.root.name, 'objects').glob('*/*'):
+            blob.write_bytes(b'%PDF damage')
+        with self.assertRaisesMessage(CommandError, "failed verification"):
+            self._backup()
+        self.assertEqual(len(backup.list_snapshots()), 1)
+        self.assertEqual(len(list(Path(self.root.name, 'snapshots').iterdir())), 1)
+
+    def test_damaged_backup_is_not_restored(self):
+        self._backup()
+        name = backup.list_snapshots()[0]
+        for blob in Path(self.root.name, 'objects').glob('*/*'):
+            blob.write_bytes(b'damaged')
+        with self.assertRaises(CommandError):
+            call_command('restore', '--verify', stdout=StringIO())
+        with self.assertRaises(backup.BackupError):
+            backup.restore_snapshot(name)
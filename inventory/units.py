@@ -0,0 +1,66 @@
+import re
+from fractions import Fraction
+
+# Each kind of quantity is stored in one canonical unit. The factors convert
+# a value in the given unit to the canonical one.
+QUANTITIES = {
+    'power': {
+        'canonical': 'hp',
+        'units': {'hp': 1.0, 'horsepower': 1.0, 'kw': 1.341022, 'w': 0.001341022},
+    },
+    'speed': {
+        'canonical': 'rpm',
+        'units': {'rpm': 1.0, 'rps': 60.0},
+    },
+    'size': {
+        'canonical': 'in',
+        'units': {'in': 1.0, 'inch': 1.0, 'inches': 1.0, '"': 1.0, 'mm': 1 / 25.4, 'cm': 1 / 2.54},
+    },
+}
+
+# A whole number, decimal or fraction, optionally followed by a fraction
+# ("1-1/2", "1 1/2"), then an optional unit.
+QUANTITY_PATTERN = re.compile(
+    r'^\s*(?P<number>\d[\d,]*(?:\.\d+)?|\.\d+)'
+    r'(?:(?:\s+|-)(?P<fraction>\d+/\d+)|/(?P<denominator>\d+))?'
+    r'\s*(?P<unit>[a-zA-Z"]+)?'
+)
+
+
+def parse_quantity(text, quantity):
+    """
+    Parse free text such as '7.5 HP', '11 kW', '1-1/2"' or '3,450 rpm'.
+
+    Return (value in the canonical unit, unit as written), or (None, '') when the
+    text can't be understood. A missing unit is taken to be the canonical one.
+    """
+    match = QUANTITY_PATTERN.match(text or '')
+    if not match:
+        return None, ''
+
+    number = Fraction(match['number'].replace(',', ''))
+    if match['denominator']:
+        number = number / int(match['denominator'])
+    if match['fraction']:
+        number += Fraction(match['fraction'])
+
+    definition = QUANTITIES[quantity]
+    unit = (match['unit'] or definition['canonical']).lower()
+    if unit not in definition['units']:
+        return None, ''
+    return round(float(number) * definition['units'][unit], 4), unit
+
+
+def apply_spec_values(instance):
+    """
+    Refresh the <field>_value / <field>_unit columns of an item from its
+    free-text spec fields. Return True if anything changed.
+    """
+    changed = False
+    for field_name, quantity in getattr(instance, 'SPEC_FIELDS', {}).items():
+        value, unit = parse_quantity(getattr(instance, field_name), quantity)
+        if getattr(instance, f'{field_name}_value') != value or getattr(instance, f'{field_name}_unit') != unit:
+            setattr(instance, f'{field_name}_value', value)
+            setattr(instance, f'{field_name}_unit', unit)
+            changed = True
+    return changed
@@ -1,14 +1,23 @@
 from django.urls import path
 from . import views
+from .query_budget import query_budget
 
+# query_budget() is the most queries each view may run for a GET, including the
+# session and user lookups. QueryBudgetTest checks them at 10 and 1000 rows.
 urlpatterns = [
-    path('', views.item_list, name='item_list'),
-    path('item/<int:pk>/', views.item_detail, name='item_detail'),
-    path('item/<int:pk>/edit/', views.edit_item, name='edit_item'),
-    path('item/<int:pk>/delete/', views.delete_item, name='delete_item'),
-    path('add/', views.add_item_chooser, name='add_item_chooser'),
-    path('add/<str:category>/', views.add_item, name='add_item'),
-    path('history/', views.log_history, name='log_history'),
-    path('repair/<int:pk>/complete/', views.complete_repair, name='complete_repair'),
-    path('manage-statuses/', views.manage_statuses, name='manage_statuses'),
+    path('', query_budget(8)(views.item_list), name='item_list'),
+    path('typeahead/', query_budget(1)(views.item_typeahead), name='item_typeahead'),
+    path('item/<int:pk>/', query_budget(6)(views.item_detail), name='item_detail'),
+    path('item/<int:pk>/edit/', query_budget(7)(views.edit_item), name='edit_item'),
+    path('bulk-edit/', views.bulk_edit_items, name='bulk_edit_items'),
+    path('item/<int:pk>/delete/', query_budget(3)(views.delete_item), name='delete_item'),
+    path('add/', query_budget(2)(views.add_item_chooser), name='add_item_chooser'),
+    path('add/<str:category>/', query_budget(4)(views.add_item), name='add_item'),
+    path('history/', query_budget(3)(views.log_history), name='log_history'),
+    path('repairs/analytics/', query_budget(10)(views.repair_analytics), name='repair_analytics'),
+    path('repairs/overdue/', query_budget(4)(views.overdue_repair_list), name='overdue_repair_list'),
+    path('sites/search/', query_budget(3)(views.site_search), name='site_search'),
+    path('sites/summary/', query_budget(6)(views.site_summary), name='site_summary'),
+    path('repair/<int:pk>/complete/', query_budget(4)(views.complete_repair), name='complete_repair'),
+    path('manage-statuses/', query_budget(3)(views.manage_statuses), name='manage_statuses'),
 ]
\ No newline at end of file
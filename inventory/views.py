@@ -1,14 +1,35 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import JsonResponse, QueryDict, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.contrib.auth import logout
+from django.contrib.auth.views import redirect_to_login
+from django.db import transaction
+from django import forms
 from unicodedata import category
+from datetime import datetime
+import math
 
-from .models import BaseItem, LogEntry, Status, RepairLog
-from django.db.models import Q
+from .models import (
+    BaseItem, LogEntry, Status, RepairLog, Pump, Valve, Filter, MixTank, Location, ConcurrentUpdateError, item_url
+)
+from django.db.models import Q, Count, F
+from django.db.models.functions import Substr
 from django.utils import timezone
+from .analytics import analytics_period, default_analytics_period, get_repair_analytics
+from .duplicates import find_similar, index_items
+from .labels import label_sheet_pdf
+from .overdue import overdue_repairs
+from .pagination import EstimatedCountPaginator
+from .reference import get_statuses
+from .routers import is_site_database
+from .search import prefix_range
+from .sites import fan_out, merge_counts, merge_sorted
+from .streaming import stream_table, wants_streaming
 from .forms import (
-    RepairLogForm, PumpForm, ValveForm, FilterForm, MixTankForm, CommandCenterForm, MiscForm
+    RepairLogForm, PumpForm, ValveForm, FilterForm, MixTankForm, CommandCenterForm, MiscForm, BulkEditForm
 )
 
 FORM_MAP = {
@@ -20,18 +41,62 @@ FORM_MAP = {
     'misc': MiscForm
 }
 
-def item_list(request):
-    # Get the search query from the URL's 'q' parameter
-    query = request.GET.get('q')
-    status_filter = request.GET.get('status')
+# Range filters on the parsed spec columns (see units.py). Each URL parameter
+# pair <name>_min / <name>_max maps to the child tables holding that value.
+SPEC_FILTERS = {
+    'power': [(Pump, 'power_value'), (MixTank, 'power_value')],
+    'speed': [(Pump, 'speed_value')],
+    'size': [(Valve, 'size_value')],
+    'inlet': [(Pump, 'inlet_value'), (MixTank, 'inlet_value'), (Filter, 'inlet_value')],
+    'outlet': [(Pump, 'outlet_value'), (MixTank, 'outlet_value'), (Filter, 'outlet_value')],
+}
+
+# The child tables with parsed specs, joined for the JSON output
+SPEC_CHILDREN = ['pump', 'valve', 'filter', 'mixtank']
+
+# Page size limits for ?format=json
+JSON_DEFAULT_LIMIT = 100
+JSON_MAX_LIMIT = 1000
+
+# Rows fetched per query while streaming ?format=labels
+LABEL_QUERY_CHUNK_SIZE = 2000
+
+# Most results a cross-site search returns (and asks each site for)
+SITE_SEARCH_LIMIT = 100
+
+# Overdue repairs per page, in the HTML and the JSON
+OVERDUE_PAGE_SIZE = 100
 
-    # Start with all items
-    items = BaseItem.objects.all()
-    statuses = Status.objects.all().order_by('name')
 
-    # Filter by status if selected
+def _float_param(params, name):
+    try:
+        value = float(params[name])
+    except (KeyError, ValueError):
+        return None
+    # nan and inf aren't bounds anyone means to filter by
+    return value if math.isfinite(value) else None
+
+
+def filter_items(params, location=None):
+    """
+    Apply the item_list filters (status, location, search text and spec ranges)
+    from a QueryDict such as request.GET and return the matching items. Pass
+    `location` when the caller has already looked it up.
+    """
+    query = params.get('q')
+    status_filter = params.get('status')
+
+    # Start with all items, joining the status so the template does not query it per row
+    items = BaseItem.objects.select_related('status')
+
+    # Filter by status if selected (a comma separated list selects several)
     if status_filter:
-        items = items.filter(status__in=status_filter)
+        items = items.filter(status__in=[pk for pk in status_filter.split(',') if pk.isdigit()])
+
+    # Everything stored at or below a location node: one range on its path
+    location = location or _get_location(params)
+    if location:
+        items = items.filter(location.subtree_q('location_node__path'))
 
     # If a query was provided, filter the items
     if query:
@@ -44,18 +109,182 @@ def item_list(request):
             Q(vendor__icontains=query)
         )
 
-    items = items.order_by('category', 'item_id')
+    # Each spec range is a range scan on the child table's index, e.g.
+    # pk IN (SELECT baseitem_ptr_id FROM pump WHERE power_value >= 5)
+    for name, columns in SPEC_FILTERS.items():
+        low = _float_param(params, f'{name}_min')
+        high = _float_param(params, f'{name}_max')
+        if low is None and high is None:
+            continue
+        condition = Q()
+        for model, column in columns:
+            matches = model.objects.all()
+            if low is not None:
+                matches = matches.filter(**{f'{column}__gte': low})
+            if high is not None:
+                matches = matches.filter(**{f'{column}__lte': high})
+            condition |= Q(pk__in=matches.values('pk'))
+        items = items.filter(condition)
+
+    return items.order_by('category', 'item_id')
+
+
+def _get_location(params):
+    location_id = params.get('location', '')
+    if not location_id.isdigit():
+        return None
+    return Location.objects.filter(pk=location_id).first()
+
+
+def location_counts(items, parent=None):
+    """
+    Return (child location, item count) for each child of `parent` (or each
+    site when there is no parent), counting everything stored in the child's
+    subtree. Paths use fixed-width steps, so one GROUP BY on the path prefix
+    of the child's depth counts all the subtrees in a single query.
+    """
+    children = list(parent.children.all() if parent else Location.objects.filter(parent=None))
+    if not children:
+        return []
+
+    prefix_length = (parent.depth + 2 if parent else 1) * Location.PATH_STEP
+    counts = dict(
+        items.filter(location_node__isnull=False)
+        .annotate(prefix=Substr('location_node__path', 1, prefix_length))
+        .values('prefix')
+        .annotate(count=Count('pk'))
+        .order_by()
+        .values_list('prefix', 'count')
+    )
+    return [(child, counts.get(child.path, 0)) for child in children]
+
+
+def _item_json(item):
+    specs = {}
+    for child_name in SPEC_CHILDREN:
+        child = getattr(item, child_name, None)
+        if child is None:
+            continue
+        for field_name in child.SPEC_FIELDS:
+            specs[field_name] = {
+                'text': getattr(child, field_name),
+                'value': getattr(child, f'{field_name}_value'),
+                'unit': getattr(child, f'{field_name}_unit'),
+            }
+    return {
+        'id': item.pk,
+        'item_id': item.item_id,
+        'category': item.category,
+        'description': item.description,
+        'vendor': item.vendor,
+        'location': item.location,
+        'status': item.status.name if item.status else None,
+        'last_updated': item.last_updated.isoformat(),
+        'url': item.get_absolute_url(),
+        'specs': specs,
+    }
+
 
+def item_list(request):
+    location = _get_location(request.GET)
+    items = filter_items(request.GET, location)
+    output_format = request.GET.get('format')
+
+    if output_format == 'json':
+        try:
+            limit = max(1, min(int(request.GET.get('limit', JSON_DEFAULT_LIMIT)), JSON_MAX_LIMIT))
+            offset = max(int(request.GET.get('offset', 0)), 0)
+        except ValueError:
+            return JsonResponse({'error': "limit and offset must be whole numbers."}, status=400)
+        # Join the spec-carrying child tables so every row is built from one query
+        page = items.select_related(*SPEC_CHILDREN)[offset:offset + limit]
+        return JsonResponse({'results': [_item_json(item) for item in page], 'offset': offset, 'limit': limit})
+
+    if output_format == 'labels':
+        # The list is public, but printing labels for it is not
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        # Label sheets are drawn and sent a page at a time, so any selection size works.
+        # The rows are read after the view returns, so fix the database now.
+        items = items.using(items.db)
+        labels = (
+            (item_id, request.build_absolute_uri(item_url('item_detail', pk, site)))
+            for pk, item_id, site in items.values_list('pk', 'item_id', 'site').iterator(
+                chunk_size=LABEL_QUERY_CHUNK_SIZE
+            )
+        )
+        response = StreamingHttpResponse(label_sheet_pdf(labels), content_type='application/pdf')
+        response['Content-Disposition'] = 'inline; filename="labels.pdf"'
+        return response
+
+    statuses = get_statuses()
+
+    streaming = wants_streaming(request)
     context = {
         'items': items,
         'statuses': statuses,
     }
 
-    if request.GET.get('format') == 'print':
+    if output_format == 'print':
+        if streaming:
+            return stream_table(request, 'inventory/item_list_print.html', 'inventory/item_list_print_rows.html',
+                                context, items)
         return render(request, 'inventory/item_list_print.html', context)
 
+    # Streamed rows are only read once the page head is out, so ask up front
+    context['has_items'] = items.exists() if streaming else items
+    if request.user.has_perm('inventory.change_baseitem'):
+        context['bulk_form'] = BulkEditForm()
+
+    # Location drill-down: the current node's ancestors and its children with item counts
+    context['location'] = location
+    context['location_ancestors'] = Location.objects.filter(pk__in=location.ancestor_ids()) if location else []
+    context['location_children'] = location_counts(items, location)
+
+    if streaming:
+        return stream_table(request, 'inventory/item_list.html', 'inventory/item_list_rows.html', context, items)
     return render(request, 'inventory/item_list.html', context)
 
+# Fields the typeahead can complete, and how many suggestions it returns
+TYPEAHEAD_FIELDS = ['item_id', 'location']
+TYPEAHEAD_DEFAULT_RESULTS = 10
+TYPEAHEAD_MAX_RESULTS = 25
+
+
+def item_typeahead(request):
+    query = request.GET.get('q', '').strip()
+    field = request.GET.get('field', 'item_id')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', TYPEAHEAD_DEFAULT_RESULTS)), TYPEAHEAD_MAX_RESULTS))
+    except ValueError:
+        limit = TYPEAHEAD_DEFAULT_RESULTS
+
+    results = []
+    if query and field in TYPEAHEAD_FIELDS:
+        # Operators rarely match the stored case, so try the common spellings.
+        # Each one is still a range on the same index.
+        condition = Q()
+        for prefix in {query, query.upper(), query.capitalize(), query.title()}:
+            condition |= prefix_range(field, prefix)
+        matches = BaseItem.objects.filter(condition)
+
+        if field == 'item_id':
+            for item in matches.order_by('item_id').values('pk', 'item_id', 'category', 'location', 'site')[:limit]:
+                results.append({
+                    'value': item['item_id'],
+                    'label': f"{item['item_id']} ({item['category']})",
+                    'location': item['location'],
+                    'url': item_url('item_detail', item['pk'], item['site']),
+                })
+        else:
+            locations = matches.order_by('location').values_list('location', flat=True).distinct()[:limit]
+            results = [{'value': location, 'label': location} for location in locations]
+
+    response = JsonResponse({'results': results})
+    # Let the browser reuse answers while the operator keeps typing the same prefix
+    patch_cache_control(response, private=True, max_age=30)
+    return response
+
 def item_detail(request, pk):
     # Takes a single item by its primary key and sends it to a detail template
     item = get_object_or_404(BaseItem, pk=pk)
@@ -86,6 +315,7 @@ def add_item(request, category):
     if FormClass is None:
         return redirect('item_list')
 
+    duplicates = []
     if request.method == 'POST':
         form = FormClass(request.POST, request.FILES)
         if form.is_valid():
@@ -98,21 +328,75 @@ def add_item(request, category):
             # Save user
             new_item.updated_by = request.user
 
-            # Save the object to database
-            new_item.save()
+            # Show likely duplicates first; the user can confirm to save anyway
+            if not request.POST.get('confirm_duplicate'):
+                duplicates = find_similar(new_item)
 
-            return redirect('item_list')
+            if not duplicates:
+                # Save the object to database
+                with transaction.atomic():
+                    new_item.save()
+
+                return redirect('item_list')
     else:
         # Create a blank form
         form = FormClass()
 
     context = {
         'form': form,
-        'category': category.title()
+        'category': category.title(),
+        'duplicates': duplicates,
     }
     return render(request, 'inventory/add_item.html', context)
 
 
+def _posted_version(data, name, default):
+    """
+    The version of an object the user loaded the form with.
+    """
+    try:
+        return int(data[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _edit_conflict(request, item, conflict, item_form, repair_form):
+    """
+    Someone else saved the item or its repair while this user was editing.
+    Show which fields differ between their submission and what is saved now,
+    and let them resubmit against the current version.
+    """
+    form = repair_form if isinstance(conflict.instance, RepairLog) else item_form
+    current = type(conflict.instance).objects.get(pk=conflict.instance.pk)
+
+    differences = []
+    for name, field in form.fields.items():
+        if isinstance(field, forms.FileField):
+            continue
+        mine, theirs = form.cleaned_data.get(name), getattr(current, name, None)
+        if (mine or '') != (theirs or ''):
+            differences.append((field.label or name, mine, theirs))
+
+    # Resubmitting posts the same values with the versions that are current now
+    versions = {'version': BaseItem.objects.values_list('version', flat=True).get(pk=item.pk)}
+    active_repair = repair_form.instance
+    if active_repair.pk:
+        versions['repair-version'] = RepairLog.objects.values_list('version', flat=True).get(pk=active_repair.pk)
+    resubmit = [
+        (name, value)
+        for name, values in request.POST.lists() if name not in {'csrfmiddlewaretoken', *versions}
+        for value in values
+    ] + list(versions.items())
+
+    context = {
+        'item': item,
+        'object_name': form.instance._meta.verbose_name,
+        'differences': differences,
+        'resubmit': resubmit,
+        'had_files': bool(request.FILES),
+    }
+    return render(request, 'inventory/edit_conflict.html', context, status=409)
+
 @login_required
 @permission_required('inventory.change_baseitem', raise_exception=True)
 def edit_item(request, pk):
@@ -128,41 +412,53 @@ def edit_item(request, pk):
     active_repair = child_instance.repairs.filter(is_active=True).first()
 
     if request.method == 'POST':
+        # Saves only succeed if the rows still have the versions the form was loaded with
+        child_instance.version = _posted_version(request.POST, 'version', child_instance.version)
+        if active_repair:
+            active_repair.version = _posted_version(request.POST, 'repair-version', active_repair.version)
+
         item_form = ItemFormClass(request.POST, request.FILES, instance=child_instance)
         repair_form = RepairLogForm(request.POST, request.FILES, prefix='repair', instance=active_repair)
 
         if item_form.is_valid():
             new_status = item_form.cleaned_data.get('status')
 
-            if new_status and new_status.name == 'Repair':
-                if repair_form.is_valid():
-                    item_form.instance.updated_by = request.user
-                    updated_item = item_form.save()
-
-                    repair_log = repair_form.save(commit=False)
-                    repair_log.item = updated_item
-                    repair_log.is_active = True
-                    repair_log.save()
-
-                    log_action = "Repair Updated"
-                    if not active_repair:  # If there was no active repair before, this is a new one
-                        log_action = "Repair Started"
-
-                    LogEntry.objects.create(
-                        user=request.user,
-                        action=log_action,
-                        item_id_str=updated_item.item_id,
-                        details=f"Company: {repair_log.repair_company}, Cost: ${repair_log.cost or 'N/A'}"
-                    )
+            try:
+                if new_status and new_status.name == 'Repair':
+                    if repair_form.is_valid():
+                        # Item, repair log and history entry are written in one transaction
+                        with transaction.atomic():
+                            item_form.instance.updated_by = request.user
+                            updated_item = item_form.save()
+
+                            repair_log = repair_form.save(commit=False)
+                            repair_log.item = updated_item
+                            repair_log.is_active = True
+                            repair_log.save()
+
+                            log_action = "Repair Updated"
+                            if not active_repair:  # If there was no active repair before, this is a new one
+                                log_action = "Repair Started"
+
+                            LogEntry.objects.create(
+                                user=request.user,
+                                action=log_action,
+                                item_id_str=updated_item.item_id,
+                                details=f"Company: {repair_log.repair_company}, Cost: ${repair_log.cost or 'N/A'}"
+                            )
+
+                        messages.success(request, f"Item '{updated_item.item_id}' updated and repair log saved.")
+                        return redirect('item_detail', pk=base_item.pk)
 
-                    messages.success(request, f"Item '{updated_item.item_id}' updated and repair log saved.")
+                else:
+                    with transaction.atomic():
+                        item_form.instance.updated_by = request.user
+                        item_form.save()
+                    messages.success(request, f"Item '{item_form.instance.item_id}' was updated successfully.")
                     return redirect('item_detail', pk=base_item.pk)
 
-            else:
-                item_form.instance.updated_by = request.user
-                item_form.save()
-                messages.success(request, f"Item '{item_form.instance.item_id}' was updated successfully.")
-                return redirect('item_detail', pk=base_item.pk)
+            except ConcurrentUpdateError as conflict:
+                return _edit_conflict(request, base_item, conflict, item_form, repair_form)
 
     else:
         item_form = ItemFormClass(instance=child_instance)
@@ -175,6 +471,85 @@ def edit_item(request, pk):
     }
     return render(request, 'inventory/edit_item.html', context)
 
+# Rows per UPDATE / INSERT when changing selected items in bulk
+BULK_EDIT_BATCH_SIZE = 500
+
+
+@login_required
+@permission_required('inventory.change_baseitem', raise_exception=True)
+def bulk_edit_items(request):
+    """
+    Apply one status, location and/or vendor change to the selected items, or
+    to every item matching the list's filter. Everything happens in a single
+    transaction: one SELECT of the current values, UPDATE statements instead
+    of per-item saves, and one bulk_create of history entries.
+    """
+    filter_query = request.POST.get('filter', '')
+    redirect_url = reverse('item_list') + (f'?{filter_query}' if filter_query else '')
+    if request.method != 'POST':
+        return redirect(redirect_url)
+
+    form = BulkEditForm(request.POST)
+    if not form.is_valid():
+        for error in form.non_field_errors():
+            messages.error(request, error)
+        return redirect(redirect_url)
+
+    # Model field -> new value, and the text columns used to describe the change
+    changes = {}
+    described = {}  # column -> (label, new text)
+    status = form.cleaned_data['status']
+    if status:
+        changes['status'] = status
+        described['status__name'] = ("Status", status.name)
+    location_node = form.cleaned_data['location_node']
+    if location_node:
+        location_text = location_node.full_name[:BaseItem._meta.get_field('location').max_length]
+        changes['location_node'] = location_node
+        changes['location'] = location_text
+        described['location'] = ("Location", location_text)
+    vendor = form.cleaned_data['vendor']
+    if vendor:
+        changes['vendor'] = vendor
+        described['vendor'] = ("Vendor", vendor)
+    changes['last_updated'] = timezone.now()
+    # update() skips VersionedModel.save(), so bump the version here to make
+    # edit forms opened before this change fail instead of overwriting it
+    changes['version'] = F('version') + 1
+
+    if form.cleaned_data['scope'] == 'filtered':
+        # Re-run the list's filter inside the UPDATE as a subquery
+        batches = [BaseItem.objects.filter(pk__in=filter_items(QueryDict(filter_query)).values('pk'))]
+    else:
+        selected = sorted({int(pk) for pk in request.POST.getlist('selected') if pk.isdigit()})
+        batches = [
+            BaseItem.objects.filter(pk__in=selected[start:start + BULK_EDIT_BATCH_SIZE])
+            for start in range(0, len(selected), BULK_EDIT_BATCH_SIZE)
+        ]
+
+    columns = list(described)
+    log_entries = []
+    updated = 0
+    with transaction.atomic():
+        for batch in batches:
+            for item_id, *old_values in batch.order_by().values_list('item_id', *columns).iterator():
+                details = [
+                    f"{label} from '{old or ''}' to '{new}'"
+                    for (label, new), old in zip(described.values(), old_values) if (old or '') != new
+                ]
+                if details:
+                    log_entries.append(LogEntry(user=request.user, action="Bulk Updated",
+                                                item_id_str=item_id, details="; ".join(details)))
+            updated += batch.update(**changes)
+            if vendor:
+                # update() skips the save signals that keep the duplicate index current
+                index_items(batch)
+        LogEntry.objects.bulk_create(log_entries, batch_size=BULK_EDIT_BATCH_SIZE)
+
+    messages.success(request, f"{updated} item(s) updated.")
+    return redirect(redirect_url)
+
+
 @login_required
 @permission_required('inventory.delete_baseitem', raise_exception=True)
 def delete_item(request, pk):
@@ -182,13 +557,14 @@ def delete_item(request, pk):
 
     # When user confirms deletion
     if request.method == 'POST':
-        LogEntry.objects.create(
-            user=request.user,
-            action="Deleted",
-            item_id_str=item.item_id,
-            details=f"Item from category '{item.get_category_display()}' was deleted."
-        )
-        item.delete()
+        with transaction.atomic():
+            LogEntry.objects.create(
+                user=request.user,
+                action="Deleted",
+                item_id_str=item.item_id,
+                details=f"Item from category '{item.get_category_display()}' was deleted."
+            )
+            item.delete()
         return redirect('item_list')
 
     context = {
@@ -199,11 +575,122 @@ def delete_item(request, pk):
 @login_required
 def log_history(request):
     logs = LogEntry.objects.all()
+    # A site's own database has no users to join to; fetch them from 'default' instead
+    logs = logs.prefetch_related('user') if is_site_database(logs.db) else logs.select_related('user')
     context = {
         'logs': logs
     }
+    if wants_streaming(request):
+        return stream_table(request, 'inventory/log_history.html', 'inventory/log_history_rows.html', context, logs)
     return render(request, 'inventory/log_history.html', context)
 
+def _month_param(params, name, default):
+    """
+    Parse a YYYY-MM parameter into the first day of that month.
+    """
+    try:
+        return datetime.strptime(params.get(name, ''), '%Y-%m').date()
+    except ValueError:
+        return default
+
+
+@login_required
+def repair_analytics(request):
+    # The period is whole months, from the start of `start` to the end of `end`;
+    # by default the last twelve months including the current one
+    default_start, default_end = default_analytics_period()
+    start, end = analytics_period(
+        _month_param(request.GET, 'start', default_start),
+        _month_param(request.GET, 'end', default_end),
+    )
+
+    report = get_repair_analytics(start, end)
+    if request.GET.get('format') == 'json':
+        return JsonResponse(report)
+
+    context = {
+        'report': report,
+        'start_month': start.strftime('%Y-%m'),
+        'end_month': end.strftime('%Y-%m'),
+    }
+    return render(request, 'inventory/repair_analytics.html', context)
+
+@login_required
+def overdue_repair_list(request):
+    today = timezone.localdate()
+    paginator = EstimatedCountPaginator(overdue_repairs(today).select_related('item'), OVERDUE_PAGE_SIZE)
+    repairs = paginator.get_page(request.GET.get('page'))
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'page': repairs.number,
+            'num_pages': paginator.num_pages,
+            'count': paginator.count,
+            'results': [
+                {
+                    'id': repair.pk,
+                    'item_id': repair.item.item_id,
+                    'url': repair.item.get_absolute_url(),
+                    'repair_company': repair.repair_company,
+                    'start_date': repair.start_date,
+                    'expected_return_date': repair.expected_return_date,
+                    'days_overdue': (today - repair.expected_return_date).days,
+                }
+                for repair in repairs
+            ],
+        })
+
+    return render(request, 'inventory/overdue_repairs.html', {'repairs': repairs, 'today': today})
+
+@login_required
+def site_search(request):
+    # Search every site's items with the item_list text and spec filters.
+    # Status and location IDs belong to one site, so those filters don't apply.
+    params = request.GET.copy()
+    for name in ['status', 'location']:
+        params.pop(name, None)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', SITE_SEARCH_LIMIT)), SITE_SEARCH_LIMIT))
+    except ValueError:
+        limit = SITE_SEARCH_LIMIT
+
+    def search(site):
+        items = filter_items(params).select_related(*SPEC_CHILDREN)[:limit]
+        results = []
+        for item in items:
+            result = _item_json(item)
+            result['site'] = site
+            results.append(result)
+        return results
+
+    results = []
+    if params.get('q') or any(name.endswith(('_min', '_max')) for name in params):
+        results = merge_sorted(fan_out(search), key=lambda result: (result['category'], result['item_id']), limit=limit)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'results': results, 'limit': limit})
+    return render(request, 'inventory/site_search.html', {'results': results, 'query': params.get('q', '')})
+
+@login_required
+def site_summary(request):
+    today = timezone.localdate()
+
+    def summary(site):
+        items = BaseItem.objects.order_by()
+        by_status = items.values('status__name').annotate(count=Count('pk')).values_list('status__name', 'count')
+        return {
+            'items': items.count(),
+            'by_status': {name or "No status": count for name, count in by_status},
+            'active_repairs': RepairLog.objects.filter(is_active=True).count(),
+            'overdue_repairs': overdue_repairs(today).count(),
+        }
+
+    sites = fan_out(summary)
+    report = {'sites': sites, 'total': merge_counts(sites)}
+    if request.GET.get('format') == 'json':
+        return JsonResponse(report)
+    return render(request, 'inventory/site_summary.html', {'report': report})
+
 @login_required
 def logout_view(request):
     logout(request)
@@ -222,14 +709,14 @@ def manage_statuses(request):
             if status_to_delete.is_protected:
                 messages.error(request, f"Cannot delete protected status '{status_to_delete.name}'.")
             else:
-                warehouse_status, created = Status.objects.get_or_create(name="Warehouse")
+                with transaction.atomic():
+                    warehouse_status, created = Status.objects.get_or_create(name="Warehouse")
 
-                # Find all items using the status to be deleted and update them in bulk
-                items_to_reassign = BaseItem.objects.filter(status=status_to_delete)
-                count = items_to_reassign.count()
-                items_to_reassign.update(status=warehouse_status)
+                    # Find all items using the status to be deleted and update them in bulk
+                    items_to_reassign = BaseItem.objects.filter(status=status_to_delete)
+                    count = items_to_reassign.update(status=warehouse_status, version=F('version') + 1)
 
-                status_to_delete.delete()
+                    status_to_delete.delete()
                 messages.success(request,
                                  f"Status '{status_to_delete.name}' deleted. {count} item(s) reassigned to Warehouse.")
 
@@ -237,7 +724,8 @@ def manage_statuses(request):
         else:
             new_status_name = request.POST.get('name')
             if new_status_name:
-                status, created = Status.objects.get_or_create(name=new_status_name)
+                with transaction.atomic():
+                    status, created = Status.objects.get_or_create(name=new_status_name)
                 if created:
                     messages.success(request, f"Status '{status.name}' added.")
                 else:
@@ -256,26 +744,37 @@ def complete_repair(request, pk):
     item = repair_log.item
 
     if request.method == 'POST':
-        repair_log.is_active = False
-        repair_log.end_date = timezone.now().date()
-        repair_log.save()
-
-        LogEntry.objects.create(
-            user=request.user,
-            action="Repair Completed",
-            item_id_str=item.item_id,
-            details=f"Repair by {repair_log.repair_company} marked as complete."
-        )
-
+        repair_log.version = _posted_version(request.POST, 'version', repair_log.version)
         try:
-            warehouse_status = Status.objects.get(name="Warehouse")
-            item.status = warehouse_status
-            item.updated_by = request.user
-            item.save()
-            messages.success(request, f"Repair for {item.item_id} has been marked as complete.")
-        except Status.DoesNotExist:
-            messages.error(request, "CRITICAL: The 'Warehouse' status does not exist. Please create it.")
+            with transaction.atomic():
+                repair_log.is_active = False
+                repair_log.end_date = timezone.now().date()
+                repair_log.save()
+
+                LogEntry.objects.create(
+                    user=request.user,
+                    action="Repair Completed",
+                    item_id_str=item.item_id,
+                    details=f"Repair by {repair_log.repair_company} marked as complete."
+                )
+
+                try:
+                    warehouse_status = Status.objects.get(name="Warehouse")
+                    item.status = warehouse_status
+                    item.updated_by = request.user
+                    item.save()
+                    messages.success(request, f"Repair for {item.item_id} has been marked as complete.")
+                except Status.DoesNotExist:
+                    messages.error(request, "CRITICAL: The 'Warehouse' status does not exist. Please create it.")
+        except ConcurrentUpdateError as conflict:
+            # Nothing was saved either way; say which record was out of date
+            if conflict.instance is repair_log:
+                messages.error(request, f"The repair for {item.item_id} was changed by someone else. "
+                                        f"Check the current details before completing it.")
+            else:
+                messages.error(request, f"{item.item_id} was changed by someone else while its repair was being "
+                                        f"completed. The repair is still open; complete it again.")
 
         return redirect('item_detail', pk=item.pk)
 
-    return redirect('item_detail', pk=item.pk)
\ No newline at end of file
+    return redirect('item_detail', pk=item.pk)
@@ -0,0 +1,108 @@
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.urls import get_resolver
+
+from .analytics import default_analytics_period, get_repair_analytics
+from .reference import get_statuses
+from .routers import active_site
+
+
+def resolve_urls():
+    """
+    Build the URL resolver's lookup tables, which Django otherwise does on the
+    first request and the first reverse(). Return the number of URL names.
+    """
+    resolver = get_resolver()
+    return len(resolver.reverse_dict)
+
+
+def template_names():
+    """
+    The names of the project's and the inventory app's templates.
+    """
+    directories = [Path(directory) for directory in engines['django'].engine.dirs]
+    directories.append(Path(apps.get_app_config('inventory').path) / 'templates')
+    return sorted({
+        path.relative_to(directory).as_posix()
+        for directory in directories if directory.is_dir()
+        for path in directory.rglob('*.html')
+    })
+
+
+def compile_templates():
+    """
+    Load every template through the engine, so the cached loader keeps the
+    compiled versions. Return the number of templates.
+    """
+    engine = engines['django']
+    names = template_names()
+    for name in names:
+        engine.get_template(name)
+    return len(names)
+
+
+def prime_caches(reports=True):
+    """
+    Fill each site's status list and, with `reports`, its default repair
+    analytics report. Return the number of sites.
+    """
+    start, end = default_analytics_period()
+    for site in settings.INVENTORY_SITES:
+        with active_site(site):
+            get_statuses()
+            if reports:
+                get_repair_analytics(start, end)
+    return len(settings.INVENTORY_SITES)
+
+
+def open_connections():
+    """
+    Connect now, rather than on the first query, to every database whose
+    connection lasts between requests (CONN_MAX_AGE). Return the number of
+    connections.
+    """
+    persistent = [connection for connection in connections.all() if connection.settings_dict['CONN_MAX_AGE'] != 0]
+    for connection in persistent:
+        connection.ensure_connection()
+    return len(persistent)
+
+
+def warm_up(preload=True, caches=True, reports=True, connect=True):
+    """
+    Do the first-request work up front: with `preload`, URL resolution and
+    template compilation, with `caches`, cache priming and, with `connect`,
+    opening database connections. Return (step, count, seconds) for each
+    step.
+
+    gunicorn.conf.py splits it across the fork: the master runs it without
+    `caches` or `connect`, so every worker is forked with the preload done,
+    and each worker runs it without `preload`. The caches are per process,
+    so primed in the master each worker would get a copy that only its own
+    changes clear, and connections must never be shared.
+    """
+    steps = []
+    if preload:
+        steps.append(('URL names resolved', resolve_urls))
+        steps.append(('templates compiled', compile_templates))
+    if caches:
+        steps.append(('site caches primed', lambda: prime_caches(reports)))
+    if connect:
+        steps.append(('database connections opened', open_connections))
+
+    timings = []
+    for name, step in steps:
+        started = time.perf_counter()
+        count = step()
+        timings.append((name, count, time.perf_counter() - started))
+    return timings
+
+
+def format_timings(timings):
+    lines = [f"{count} {name} in {seconds * 1000:.1f}ms" for name, count, seconds in timings]
+    lines.append(f"Warm-up took {sum(seconds for name, count, seconds in timings) * 1000:.1f}ms")
+    return lines
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+import dj_database_url
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,6 +49,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inventory.middleware.ReplicaRoutingMiddleware',
+    'inventory.middleware.SiteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,13 +78,87 @@ WSGI_APPLICATION = 'inventory_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# The primary comes from DATABASE_URL (falling back to the local SQLite file).
+# Read replicas are a comma separated list of URLs in DATABASE_REPLICA_URLS, e.g.
+#   DATABASE_REPLICA_URLS=sqlite:////path/to/replica.sqlite3
+# to try the routing locally with two SQLite files.
+
 DATABASES = {
+    'default': dj_database_url.config(default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+}
+# Seconds the primary's connection stays open between requests (0 closes it
+# after every request); a health check replaces one that went away meanwhile.
+# Replicas and other sites' databases are connected to per request.
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DATABASE_CONN_MAX_AGE', '600'))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip())
+    # Tests run against the primary's test database only
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+# Warehouse sites. The default site's inventory is kept in the default
+# database, next to the tables every site shares (users, sessions). Other sites
+# are listed in INVENTORY_SITE_URLS as comma separated name=URL pairs, e.g.
+#   INVENTORY_SITE_URLS=north=sqlite:////path/to/north.sqlite3,south=sqlite:////path/to/south.sqlite3
+# and each gets a database alias of its own, site_<name>, that needs
+#   python manage.py migrate --database site_<name>
+INVENTORY_DEFAULT_SITE = os.environ.get('INVENTORY_DEFAULT_SITE', 'main')
+INVENTORY_SITES = {INVENTORY_DEFAULT_SITE: 'default'}
+for entry in filter(None, os.environ.get('INVENTORY_SITE_URLS', '').split(',')):
+    name, url = (part.strip() for part in entry.split('=', 1))
+    alias = f'site_{name}'
+    DATABASES[alias] = dj_database_url.parse(url)
+    INVENTORY_SITES[name] = alias
+
+DATABASE_ROUTERS = ['inventory.routers.ShardRouter', 'inventory.routers.ReplicaRouter']
+
+# Opt-in profile for serving the SQLite file from several gunicorn workers.
+# Every new connection gets SQLITE_PRAGMAS (see inventory/sqlite.py) and
+# transactions start with BEGIN IMMEDIATE, so writers queue on the busy
+# timeout instead of failing with "database is locked".
+SQLITE_PRODUCTION = os.environ.get('SQLITE_PRODUCTION', 'False').lower() == 'true'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,            # milliseconds
+    'cache_size': -64000,            # negative means KiB, so 64 MB
+    'mmap_size': 268435456,          # 256 MB
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PRODUCTION:
+    for alias in INVENTORY_SITES.values():
+        if DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3':
+            DATABASES[alias].setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+
+# How long a client keeps reading from the primary after it wrote something
+REPLICA_LAG_SECONDS = int(os.environ.get('REPLICA_LAG_SECONDS', '5'))
+
+# Per-process cache for analytics reports and label drawings. The default of
+# 300 entries holds only ten pages of labels; a shared cache (Redis, memcached)
+# is better when running several workers.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
     }
 }
 
+# Worker processes that draw label sheets (inventory/labels.py); 0 or 1 draws
+# them in the web process. Every gunicorn worker gets a pool of its own, so
+# keep workers x LABEL_RENDER_PROCESSES within the machine's CPUs.
+LABEL_RENDER_PROCESSES = int(os.environ.get('LABEL_RENDER_PROCESSES', '0'))
+
+# Send the item list, print view and history as a stream: the page head
+# first, then the table rows in chunks as they are read (see
+# inventory/streaming.py). ?stream=1 / ?stream=0 overrides it per request.
+STREAM_TABLES = os.environ.get('STREAM_TABLES', 'False').lower() == 'true'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,4 +208,7 @@ LOGOUT_REDIRECT_URL = '/inventory/'
 
 # Media files (user-uploaded content)
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Where `manage.py backup` keeps its snapshots and the media object store
+BACKUP_ROOT = Path(os.environ.get('BACKUP_ROOT', BASE_DIR / 'backups'))
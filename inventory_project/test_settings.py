@@ -0,0 +1,10 @@
+"""
+Settings for the test suite, which manage.py picks for `test`.
+
+The tests get a second database so sharding is tested across two real
+databases. It is a site only in the tests that make it one.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, dj_database_url
+
+DATABASES.setdefault('site_north', dj_database_url.parse(f"sqlite:///{BASE_DIR / 'site_north.sqlite3'}"))
@@ -3,7 +3,9 @@ import sys
 
 
 def main():
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_project.settings')
+    # The test suite runs with a second database (see test_settings.py)
+    default_settings = 'inventory_project.test_settings' if sys.argv[1:2] == ['test'] else 'inventory_project.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default_settings)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc: